@@ -131,6 +131,30 @@ else:
         }
     }
 
+# ====================================
+# CACHE: "llm" — ответы GigaChat (bot/llm_cache.py)
+# ====================================
+# LLM_CACHE_DIR задан — кэш на диске, общий для всех воркеров gunicorn;
+# иначе — в памяти каждого процесса
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "llm": {
+        "BACKEND": (
+            "django.core.cache.backends.filebased.FileBasedCache" if LLM_CACHE_DIR
+            else "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": LLM_CACHE_DIR or "llm-responses",
+        "TIMEOUT": LLM_CACHE_TTL,
+        "OPTIONS": {"MAX_ENTRIES": LLM_CACHE_SIZE},
+    },
+}
+
 # ====================================
 # PASSWORD VALIDATION
 # ====================================
@@ -0,0 +1,184 @@
+"""
+Полнотекстовый поиск по базе знаний в БД — альтернатива SmartHotelRAG из bot/rag.py
+с тем же методом query(). Фрагменты лежат в KnowledgeChunk, поэтому один индекс
+общий для всех процессов бота и воркеров портала, и держать файлы в памяти не нужно.
+
+PostgreSQL: tsvector('russian') с GIN-индексом, ранжирование ts_rank_cd.
+SQLite (DB_SQLITE=True): FTS5 по основам слов из bot/tokenizer.py, ранжирование bm25().
+"""
+import os
+import re
+import hashlib
+import logging
+from typing import Iterable, List, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from business_units.models import BusinessUnit
+from go_guide_portal.models import KnowledgeChunk, KnowledgeDocument
+
+from bot.chunker import Chunk, chunk_file
+from bot.context_packer import pack_context
+from bot.registry import slugify
+from bot.tokenizer import STOPWORDS, tokenize
+
+logger = logging.getLogger(__name__)
+
+CHUNK_TABLE = KnowledgeChunk._meta.db_table
+DOCUMENT_TABLE = KnowledgeDocument._meta.db_table
+FTS_TABLE = f"{CHUNK_TABLE}_fts"
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+class KnowledgeSearch:
+    # ---------------------------------------------------------
+    # Поиск
+    # ---------------------------------------------------------
+    def query(self, question: str, hotel=None, top_k: int = 3, ranking: str = None, budget: int = None) -> str:
+        """
+        Контекст по вопросу в том же виде, что SmartHotelRAG.query.
+        hotel — BusinessUnit, его id или имя отеля (файла знаний).
+        ranking принимается для совместимости: ранжирует сама БД.
+        """
+        if not hotel:
+            return ""
+        texts = self.search(question, hotel, top_k=top_k)
+        if budget is None:
+            return "\n".join(texts)
+        return pack_context(texts, budget=budget)
+
+    def search(self, question: str, hotel, top_k: int = 3) -> List[str]:
+        """Тексты лучших фрагментов отеля по убыванию релевантности."""
+        if top_k <= 0:
+            return []
+
+        if isinstance(hotel, BusinessUnit):
+            # документы, привязанные к площадке, и ещё не привязанные файлы с её именем
+            tenant_sql = "(d.business_unit_id = %s OR (d.business_unit_id IS NULL AND d.tenant = %s))"
+            tenant_params = [hotel.pk, slugify(hotel.name)]
+        elif isinstance(hotel, int) or str(hotel).isdigit():
+            tenant_sql, tenant_params = "d.business_unit_id = %s", [int(hotel)]
+        else:
+            tenant_sql, tenant_params = "d.tenant = %s", [slugify(hotel)]
+
+        vendor = connection.vendor
+        if vendor == "postgresql":
+            # стемминг делает сам PostgreSQL — отдаём ему слова как есть
+            words = [w for w in _WORD_RE.findall(question.lower()) if w not in STOPWORDS]
+            if not words:
+                return []
+            sql = f"""
+                SELECT c.text
+                FROM {CHUNK_TABLE} c
+                JOIN {DOCUMENT_TABLE} d ON d.id = c.document_id,
+                     to_tsquery('russian', %s) q
+                WHERE {tenant_sql} AND c.search_vector @@ q
+                ORDER BY ts_rank_cd(c.search_vector, q) DESC, d.id, c.position
+                LIMIT %s
+            """
+            params = [" | ".join(dict.fromkeys(words)), *tenant_params, top_k]
+        elif vendor == "sqlite":
+            stems = list(dict.fromkeys(tokenize(question)))
+            if not stems:
+                return []
+            sql = f"""
+                SELECT c.text
+                FROM {FTS_TABLE} f
+                JOIN {CHUNK_TABLE} c ON c.id = f.rowid
+                JOIN {DOCUMENT_TABLE} d ON d.id = c.document_id
+                WHERE {FTS_TABLE} MATCH %s AND {tenant_sql}
+                ORDER BY bm25({FTS_TABLE}), d.id, c.position
+                LIMIT %s
+            """
+            params = [" OR ".join(f'"{s}"' for s in stems), *tenant_params, top_k]
+        else:
+            logger.warning("Knowledge search is not supported on %s", vendor)
+            return []
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    # ---------------------------------------------------------
+    # Загрузка
+    # ---------------------------------------------------------
+    @transaction.atomic
+    def index_document(
+        self,
+        tenant: str,
+        source: str,
+        chunks: Iterable[Chunk],
+        business_unit: BusinessUnit = None,
+        sha256: str = "",
+    ) -> Tuple[int, int]:
+        """
+        Загружает фрагменты документа, переписывая только изменившиеся: фрагменты
+        сравниваются по chunk_id (источник + хэш содержимого), у оставшихся
+        обновляется лишь позиция. Возвращает (добавлено, удалено).
+        """
+        document, _ = KnowledgeDocument.objects.select_for_update().get_or_create(
+            tenant=slugify(tenant), source=source,
+        )
+        existing = {
+            chunk_id: (pk, position)
+            for pk, chunk_id, position in document.chunks.values_list("id", "chunk_id", "position")
+        }
+
+        added, moved, seen = [], [], set()
+        for position, chunk in enumerate(chunks):
+            seen.add(chunk.id)
+            current = existing.get(chunk.id)
+            if current is None:
+                added.append(KnowledgeChunk(
+                    document=document,
+                    chunk_id=chunk.id,
+                    content_hash=chunk.hash,
+                    position=position,
+                    text=chunk.text,
+                    search_text=" ".join(tokenize(chunk.text)),
+                ))
+            elif current[1] != position:
+                moved.append(KnowledgeChunk(id=current[0], position=position))
+
+        removed = [pk for chunk_id, (pk, _) in existing.items() if chunk_id not in seen]
+        KnowledgeChunk.objects.filter(id__in=removed).delete()
+        KnowledgeChunk.objects.bulk_create(added, batch_size=500)
+        KnowledgeChunk.objects.bulk_update(moved, ["position"], batch_size=500)
+
+        document.business_unit = business_unit or document.business_unit
+        document.sha256 = sha256
+        document.updated_at = timezone.now()
+        document.save()
+        return len(added), len(removed)
+
+    def index_file(self, path: str, tenant: str = None, business_unit: BusinessUnit = None) -> Tuple[int, int]:
+        """Нарезает файл знаний чанкером бота и загружает его; неизменный файл пропускается."""
+        source = os.path.basename(path)
+        tenant = tenant or os.path.splitext(source)[0]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+
+        unchanged = KnowledgeDocument.objects.filter(tenant=slugify(tenant), source=source, sha256=sha256)
+        if unchanged.exists():
+            # содержимое то же, но привязку к площадке (--unit) всё равно обновляем
+            if business_unit is not None:
+                unchanged.exclude(business_unit=business_unit).update(business_unit=business_unit)
+            return 0, 0
+        chunks = chunk_file(path, source=os.path.splitext(source)[0])
+        return self.index_document(tenant, source, chunks, business_unit=business_unit, sha256=sha256)
+
+    def remove_document(self, tenant: str, source: str) -> int:
+        deleted, _ = KnowledgeDocument.objects.filter(tenant=slugify(tenant), source=source).delete()
+        return deleted
+
+    def stats(self) -> dict:
+        return {
+            "documents": KnowledgeDocument.objects.count(),
+            "chunks": KnowledgeChunk.objects.count(),
+        }
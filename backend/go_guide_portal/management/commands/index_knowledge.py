@@ -0,0 +1,67 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from business_units.models import BusinessUnit
+from go_guide_portal.knowledge_search import KnowledgeSearch
+from go_guide_portal.models import KnowledgeDocument
+
+
+class Command(BaseCommand):
+    help = "Загружает файлы знаний (.txt/.json) в БД для полнотекстового поиска."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            help="файлы или папки (по умолчанию bot/knowledge/)",
+        )
+        parser.add_argument("--unit", type=int, help="id площадки, к которой привязать документы")
+        parser.add_argument("--tenant", help="имя отеля (по умолчанию — имя файла)")
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="удалить документы, файлов которых больше нет в указанных папках",
+        )
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or [os.path.join(settings.PROJECT_ROOT, "bot", "knowledge")]
+
+        unit = None
+        if options["unit"]:
+            unit = BusinessUnit.objects.filter(pk=options["unit"]).first()
+            if unit is None:
+                raise CommandError(f"Площадка {options['unit']} не найдена")
+
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files += [
+                    os.path.join(path, name)
+                    for name in sorted(os.listdir(path))
+                    if name.endswith(".txt") or name.endswith(".json")
+                ]
+            elif os.path.isfile(path):
+                files.append(path)
+            else:
+                raise CommandError(f"Путь не найден: {path}")
+
+        search = KnowledgeSearch()
+        for path in files:
+            added, removed = search.index_file(path, tenant=options["tenant"], business_unit=unit)
+            self.stdout.write(f"{os.path.basename(path)}: +{added} / -{removed} фрагментов")
+
+        if options["prune"]:
+            sources = {os.path.basename(path) for path in files}
+            stale = KnowledgeDocument.objects.exclude(source__in=sources)
+            if unit is not None:
+                stale = stale.filter(business_unit=unit)
+            for document in stale:
+                search.remove_document(document.tenant, document.source)
+                self.stdout.write(f"{document.source}: удалён")
+
+        stats = search.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Документов: {stats['documents']}, фрагментов: {stats['chunks']}"
+        ))
@@ -0,0 +1,118 @@
+# Generated by Django 4.2.7 on 2026-01-12 10:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+CHUNK_TABLE = "go_guide_portal_knowledgechunk"
+FTS_TABLE = "go_guide_portal_knowledgechunk_fts"
+
+POSTGRES_FORWARD = [
+    f"""
+    ALTER TABLE {CHUNK_TABLE}
+    ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('russian', coalesce(text, ''))) STORED
+    """,
+    f"CREATE INDEX knowledge_chunk_search_vector ON {CHUNK_TABLE} USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS knowledge_chunk_search_vector",
+    f"ALTER TABLE {CHUNK_TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+# FTS5 с внешним содержимым: текст хранится один раз, индекс поддерживают триггеры
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        search_text, content='{CHUNK_TABLE}', content_rowid='id'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {CHUNK_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {CHUNK_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF search_text ON {CHUNK_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+        INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+    END
+    """,
+]
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {"postgresql": POSTGRES_FORWARD, "sqlite": SQLITE_FORWARD})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_units', '0015_payout_provider_fields'),
+        ('go_guide_portal', '0005_remove_knowledgefile_business_unit_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tenant', models.CharField(db_index=True, max_length=255, verbose_name='Арендатор')),
+                ('source', models.CharField(max_length=255, verbose_name='Источник')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256 источника')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Обновлён')),
+                ('business_unit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='knowledge_documents', to='business_units.businessunit', verbose_name='Площадка')),
+            ],
+            options={
+                'verbose_name': 'Документ базы знаний',
+                'verbose_name_plural': 'Документы базы знаний',
+            },
+        ),
+        migrations.CreateModel(
+            name='KnowledgeChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_id', models.CharField(max_length=300, verbose_name='ID фрагмента')),
+                ('content_hash', models.CharField(max_length=32, verbose_name='Хэш содержимого')),
+                ('position', models.PositiveIntegerField(verbose_name='Позиция')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('search_text', models.TextField(blank=True, verbose_name='Основы слов')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='go_guide_portal.knowledgedocument', verbose_name='Документ')),
+            ],
+            options={
+                'verbose_name': 'Фрагмент базы знаний',
+                'verbose_name_plural': 'Фрагменты базы знаний',
+                'ordering': ['document', 'position'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='knowledgedocument',
+            constraint=models.UniqueConstraint(fields=('tenant', 'source'), name='knowledge_document_tenant_source'),
+        ),
+        migrations.AddConstraint(
+            model_name='knowledgechunk',
+            constraint=models.UniqueConstraint(fields=('document', 'chunk_id'), name='knowledge_chunk_document_chunk_id'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
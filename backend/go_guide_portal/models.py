@@ -14,3 +14,62 @@ class BusinessUnitUser(models.Model):
 
     def __str__(self):
         return f"{self.user.username} -> {self.business_unit.name}"
+
+
+class KnowledgeDocument(models.Model):
+    """Файл базы знаний отеля, нарезанный на фрагменты (KnowledgeChunk) для полнотекстового поиска."""
+
+    tenant = models.CharField("Арендатор", max_length=255, db_index=True)
+    business_unit = models.ForeignKey(
+        BusinessUnit,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="knowledge_documents",
+        verbose_name="Площадка",
+    )
+    source = models.CharField("Источник", max_length=255)
+    sha256 = models.CharField("SHA-256 источника", max_length=64, blank=True)
+    updated_at = models.DateTimeField("Обновлён", default=timezone.now)
+
+    class Meta:
+        verbose_name = "Документ базы знаний"
+        verbose_name_plural = "Документы базы знаний"
+        constraints = [
+            models.UniqueConstraint(fields=["tenant", "source"], name="knowledge_document_tenant_source"),
+        ]
+
+    def __str__(self):
+        return f"{self.tenant}: {self.source}"
+
+
+class KnowledgeChunk(models.Model):
+    """
+    Фрагмент документа. chunk_id и content_hash — те же, что даёт bot/chunker.py,
+    поэтому при повторной загрузке файла переписываются только изменившиеся фрагменты.
+    Полнотекстовый индекс (tsvector + GIN в PostgreSQL, FTS5 в SQLite) создаёт миграция.
+    """
+
+    document = models.ForeignKey(
+        KnowledgeDocument,
+        on_delete=models.CASCADE,
+        related_name="chunks",
+        verbose_name="Документ",
+    )
+    chunk_id = models.CharField("ID фрагмента", max_length=300)
+    content_hash = models.CharField("Хэш содержимого", max_length=32)
+    position = models.PositiveIntegerField("Позиция")
+    text = models.TextField("Текст")
+    # основы слов (bot/tokenizer.py) — по ним ищет FTS5, у которого нет русской морфологии
+    search_text = models.TextField("Основы слов", blank=True)
+
+    class Meta:
+        verbose_name = "Фрагмент базы знаний"
+        verbose_name_plural = "Фрагменты базы знаний"
+        ordering = ["document", "position"]
+        constraints = [
+            models.UniqueConstraint(fields=["document", "chunk_id"], name="knowledge_chunk_document_chunk_id"),
+        ]
+
+    def __str__(self):
+        return self.chunk_id
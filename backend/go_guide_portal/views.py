@@ -13,7 +13,8 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, update_session_auth_hash
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.cache import caches
 from django.utils import timezone
 from django.db.models import Sum, Count, Q
 from django.urls import reverse
@@ -37,16 +38,45 @@ from go_guide_portal.navigation import get_ui_texts, get_dashboard_labels
 logger = logging.getLogger(__name__)
 
 try:
-    from bot.gigachat_ai import ask_gigachat, get_gigachat_access_token
+    from bot.gigachat_ai import GIGACHAT_MODEL, ask_gigachat, get_gigachat_access_token, stream_gigachat
 except ModuleNotFoundError:
     logger.warning("bot.gigachat_ai not found; AI assistant disabled in this build.")
+    GIGACHAT_MODEL = None
 
     def ask_gigachat(*args, **kwargs):
         return "Ассистент недоступен: модуль бота не установлен."
 
+    def stream_gigachat(*args, **kwargs):
+        yield ask_gigachat()
+
     def get_gigachat_access_token(*args, **kwargs):
         return None
 
+try:
+    from bot.llm_cache import cache_key as llm_cache_key
+except ModuleNotFoundError:
+    llm_cache_key = None
+
+try:
+    from bot.rag_client import RagClient
+except ModuleNotFoundError:
+    RagClient = None
+
+# Общий сервис поиска по файлам знаний (bot/rag_service.py); пусто — ищем в БД
+RAG_SERVICE_URL = os.getenv("RAG_SERVICE_URL", "")
+rag_client = RagClient(RAG_SERVICE_URL) if RagClient and RAG_SERVICE_URL else None
+
+try:
+    from go_guide_portal.knowledge_search import KnowledgeSearch
+    knowledge_search = KnowledgeSearch()
+except ModuleNotFoundError:
+    logger.warning("bot.tokenizer not found; knowledge base search disabled in this build.")
+    knowledge_search = None
+
+# Сколько фрагментов базы знаний достаём и сколько токенов из них отдаём в промпт
+KNOWLEDGE_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", "8"))
+KNOWLEDGE_TOKEN_BUDGET = int(os.getenv("KNOWLEDGE_TOKEN_BUDGET", "600"))
+
 # Грузим .env из корня проекта и из backend (рядом с manage.py) — чтобы работало в обоих кейсах
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 BACKEND_ROOT = PROJECT_ROOT / "backend"
@@ -97,6 +127,26 @@ def _build_contacts_context(unit):
     return "Контакты площадки:\n" + "\n".join(f"- {c}" for c in contacts)
 
 
+def _build_knowledge_context(unit, question):
+    """
+    Фрагменты базы знаний площадки по вопросу: из общего сервиса поиска,
+    если он настроен, иначе полнотекстовым поиском в БД. Оба ищут отель по
+    slugify(имени площадки), как и файл знаний: «Eco House» → EcoHouse.txt.
+    """
+    if rag_client is not None:
+        backend, hotel = rag_client, unit.name
+    elif knowledge_search is not None:
+        backend, hotel = knowledge_search, unit
+    else:
+        return ""
+    try:
+        found = backend.query(question, hotel=hotel, top_k=KNOWLEDGE_TOP_K, budget=KNOWLEDGE_TOKEN_BUDGET)
+    except Exception:
+        logger.exception("Knowledge search failed for unit %s", unit.pk)
+        return ""
+    return f"База знаний:\n{found}" if found else ""
+
+
 def _build_analytics_context(unit):
     """
     Сводка по услугам и бронированиям для отчётных вопросов.
@@ -947,8 +997,47 @@ def ai_assistant_view(request):
     return render(request, "go_guide_portal/ai_assistant.html", context)
 
 
-@login_required
-def chat_with_ai(request):
+def _save_chat_turn(request, user_msg, reply):
+    chat_history = request.session.get("ai_chat_history", [])
+    chat_history.append({"role": "user", "content": user_msg})
+    chat_history.append({"role": "assistant", "content": reply})
+    request.session["ai_chat_history"] = chat_history
+    request.session.modified = True
+
+
+def _gigachat_kwargs(unit):
+    return {
+        "auth_key": unit.gigachat_auth_key,
+        "client_id": unit.gigachat_client_id,
+        "chat_url": None,
+        "scope": unit.gigachat_scope or None,
+        "tenant": unit.pk,  # лимиты запросов к GigaChat — по площадке
+    }
+
+
+def _gigachat_fallback(exc):
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        return f"Ассистент сейчас перегружен запросами. Повторите через {int(retry_after) + 1} с."
+    return (
+        "Ассистент временно недоступен (ошибка подключения к GigaChat). "
+        "Проверьте ключи/подключение и попробуйте позже. "
+        f"Техническая ошибка: {exc}"
+    )
+
+
+def _llm_cache_key(unit, prompt):
+    """Ключ ответа в кэше "llm" или None, если кэш недоступен (нет модуля бота)."""
+    if llm_cache_key is None or GIGACHAT_MODEL is None:
+        return None
+    return llm_cache_key(unit.pk, GIGACHAT_MODEL, prompt)
+
+
+def _prepare_ai_chat(request):
+    """
+    Общая часть chat_with_ai и chat_with_ai_stream: проверки, быстрые команды и сборка промпта.
+    Возвращает (unit, user_msg, prompt) или JsonResponse, которым нужно ответить сразу.
+    """
     if request.method != "POST":
         return JsonResponse({"error": "METHOD_NOT_ALLOWED"}, status=405)
 
@@ -962,11 +1051,7 @@ def chat_with_ai(request):
 
     quick_reply = _quick_command_reply(user_msg, unit)
     if quick_reply:
-        chat_history = request.session.get("ai_chat_history", [])
-        chat_history.append({"role": "user", "content": user_msg})
-        chat_history.append({"role": "assistant", "content": quick_reply})
-        request.session["ai_chat_history"] = chat_history
-        request.session.modified = True
+        _save_chat_turn(request, user_msg, quick_reply)
         return JsonResponse({"reply": quick_reply})
 
     if not unit.gigachat_auth_key:
@@ -998,16 +1083,18 @@ def chat_with_ai(request):
 
     contacts_block = _build_contacts_context(unit)
     profile_block = _build_profile_context(unit)
+    # поиск по базе знаний нужен только ответам, которые её используют
+    knowledge_block = "" if analytics_needed or bookings_needed else _build_knowledge_context(unit, user_msg)
 
     if analytics_needed:
         combined_context = "\n\n".join([part for part in [contacts_block, profile_block, analytics_block, bookings_block] if part.strip()])
     elif bookings_needed:
         combined_context = "\n\n".join([part for part in [contacts_block, profile_block, bookings_block] if part.strip()])
     elif marketing_needed:
-        combined_context = "\n\n".join([part for part in [contacts_block, profile_block, bookings_block] if part.strip()])
+        combined_context = "\n\n".join([part for part in [contacts_block, profile_block, knowledge_block, bookings_block] if part.strip()])
     else:
-        # базовый ответ: контакты, профиль, краткие брони
-        combined_context = "\n\n".join([part for part in [contacts_block, profile_block, bookings_block] if part.strip()])
+        # базовый ответ: контакты, профиль, база знаний, краткие брони
+        combined_context = "\n\n".join([part for part in [contacts_block, profile_block, knowledge_block, bookings_block] if part.strip()])
 
     if not combined_context:
         return JsonResponse({"error": "NO_CONTEXT", "message": "Не найден контекст для ответа (профиль не заполнен)."}, status=400)
@@ -1031,38 +1118,81 @@ def chat_with_ai(request):
     prompt_parts.append(f"Контекст:\n{combined_context}\n\nВопрос: {user_msg}\nОтвет:")
     prompt = " ".join(prompt_parts)
     print("[CHAT] prompt composed, context length:", len(combined_context))
+    return unit, user_msg, prompt
 
-    try:
-        reply = ask_gigachat(
-            prompt,
-            auth_key=unit.gigachat_auth_key,
-            client_id=unit.gigachat_client_id,
-            chat_url=None,
-            scope=unit.gigachat_scope or None,
-        )
-    except Exception as exc:
-        fallback = (
-            "Ассистент временно недоступен (ошибка подключения к GigaChat). "
-            "Проверьте ключи/подключение и попробуйте позже. "
-            f"Техническая ошибка: {exc}"
-        )
-        # сохраняем в историю, чтобы пользователь видел сообщение
-        chat_history = request.session.get("ai_chat_history", [])
-        chat_history.append({"role": "user", "content": user_msg})
-        chat_history.append({"role": "assistant", "content": fallback})
-        request.session["ai_chat_history"] = chat_history
-        request.session.modified = True
-        return JsonResponse({"reply": fallback, "error": "GIGACHAT_API_ERROR", "message": str(exc)}, status=200)
-
-    chat_history = request.session.get("ai_chat_history", [])
-    chat_history.append({"role": "user", "content": user_msg})
-    chat_history.append({"role": "assistant", "content": reply})
-    request.session["ai_chat_history"] = chat_history
-    request.session.modified = True
 
+@login_required
+def chat_with_ai(request):
+    prepared = _prepare_ai_chat(request)
+    if isinstance(prepared, JsonResponse):
+        return prepared
+    unit, user_msg, prompt = prepared
+
+    key = _llm_cache_key(unit, prompt)
+    reply = caches["llm"].get(key) if key else None
+    if reply is None:
+        try:
+            reply = ask_gigachat(prompt, **_gigachat_kwargs(unit))
+        except Exception as exc:
+            fallback = _gigachat_fallback(exc)
+            # сохраняем в историю, чтобы пользователь видел сообщение
+            _save_chat_turn(request, user_msg, fallback)
+            return JsonResponse({"reply": fallback, "error": "GIGACHAT_API_ERROR", "message": str(exc)}, status=200)
+        if key and reply:
+            caches["llm"].set(key, reply)
+
+    _save_chat_turn(request, user_msg, reply)
     return JsonResponse({"reply": reply})
 
 
+def _sse(payload, event=None):
+    data = json.dumps(payload, ensure_ascii=False)
+    return f"event: {event}\ndata: {data}\n\n" if event else f"data: {data}\n\n"
+
+
+@login_required
+def chat_with_ai_stream(request):
+    """
+    То же, что chat_with_ai, но ответ приходит по мере генерации (text/event-stream):
+    data: {"delta": "..."} на каждый кусок, в конце event: done с полным ответом
+    или event: error. Быстрые команды, ответы из кэша и ошибки проверок —
+    обычным JSON.
+    """
+    prepared = _prepare_ai_chat(request)
+    if isinstance(prepared, JsonResponse):
+        return prepared
+    unit, user_msg, prompt = prepared
+
+    key = _llm_cache_key(unit, prompt)
+    cached = caches["llm"].get(key) if key else None
+    if cached is not None:
+        _save_chat_turn(request, user_msg, cached)
+        return JsonResponse({"reply": cached})
+
+    def events():
+        parts = []
+        try:
+            for delta in stream_gigachat(prompt, **_gigachat_kwargs(unit)):
+                parts.append(delta)
+                yield _sse({"delta": delta})
+        except Exception as exc:
+            reply = "".join(parts) or _gigachat_fallback(exc)
+            yield _sse({"reply": reply, "error": "GIGACHAT_API_ERROR", "message": str(exc)}, event="error")
+        else:
+            reply = "".join(parts)
+            if key and reply:
+                caches["llm"].set(key, reply)
+            yield _sse({"reply": reply}, event="done")
+        # SessionMiddleware сохранил сессию до начала потока — историю дописываем сами
+        _save_chat_turn(request, user_msg, reply)
+        request.session.save()
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream; charset=utf-8")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx не должен копить поток
+    return response
+
+
 @login_required
 def gigachat_settings_view(request):
     unit = _get_user_unit(request.user)
@@ -0,0 +1,351 @@
+# bot/bench.py
+"""
+Бенчмарк поиска RAG на синтетических корпусах отеля.
+
+    python bench.py --sizes 1000,10000,100000 --modes match,bm25,tfidf,dense,hybrid
+    python bench.py --save bench_baseline.json            # сохранить эталон
+    python bench.py --baseline bench_baseline.json        # сравнить и упасть при регрессии
+    python bench.py --query --budget 400                  # ещё и через SmartHotelRAG.query
+
+Каждый размер корпуса считается в отдельном процессе, чтобы пиковый RSS
+не накапливался. Recall@k считается против полного перебора того же режима
+(у tfidf — косинуса TF-IDF векторов, посчитанных заново по словам фрагментов).
+Задержки — медиана нескольких прогонов.
+С --query те же вопросы идут через SmartHotelRAG.query (реестр, mmap-индекс,
+кэш запросов, упаковка контекста) — в таблице это строки «query:режим».
+"""
+import os
+import sys
+import json
+import time
+import math
+import random
+import argparse
+import resource
+import tempfile
+import statistics
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import rag
+from rag import HotelIndex, RANKING_MODES, BM25_K1, RRF_K, HYBRID_DEPTH
+from tokenizer import tokenize
+
+
+FACILITIES = [
+    "бассейн", "сауна", "баня", "парковка", "спа", "ресторан", "кафе", "трансфер",
+    "прокат велосипедов", "детская комната", "тренажёрный зал", "прачечная",
+    "конференц-зал", "караоке", "мангальная зона", "соляная комната", "хамам",
+    "бильярд", "теннисный корт", "экскурсии на Байкал",
+]
+CHUNK_TEMPLATES = [
+    "{f} работает с {h1}:00 до {h2}:00, стоимость {p} руб. {w}",
+    "Для гостей отеля доступна услуга «{f}» — {w}, предварительная запись у администратора.",
+    "{f}: бесплатно для проживающих, для гостей со стороны {p} руб. в час. {w}",
+    "Обратите внимание: {f} закрыт на обслуживание по понедельникам. {w}",
+    "Детям до {age} лет {f} бесплатно, взрослым — {p} руб. {w}",
+]
+QUESTION_TEMPLATES = [
+    "Во сколько работает {f}?",
+    "Сколько стоит {f}?",
+    "Есть ли у вас {f}?",
+    "{f} бесплатно для детей?",
+    "Можно ли записаться на {f} {w}?",
+]
+_SYLLABLES = "ба ве ги до жу зо ка ле ми но пу ро са ти фу хо це чи ша эю ян".split()
+
+
+def _vocabulary(size: int, rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _filler(vocab: List[str], rng: random.Random, n: int) -> str:
+    # Zipf-подобное распределение: частые слова встречаются в тысячах фрагментов
+    return " ".join(vocab[min(int(rng.paretovariate(1.1)) - 1, len(vocab) - 1)] for _ in range(n))
+
+
+def synthetic_corpus(num_chunks: int, seed: int = 42) -> List[str]:
+    rng = random.Random(seed)
+    vocab = _vocabulary(min(50000, max(1000, num_chunks // 4)), rng)
+    rng.shuffle(vocab)
+    return [
+        rng.choice(CHUNK_TEMPLATES).format(
+            f=rng.choice(FACILITIES).capitalize(),
+            h1=rng.randint(6, 12), h2=rng.randint(18, 23),
+            p=rng.randrange(100, 5000, 50), age=rng.randint(3, 14),
+            w=_filler(vocab, rng, rng.randint(4, 16)),
+        )
+        for _ in range(num_chunks)
+    ]
+
+
+def synthetic_questions(num_questions: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    vocab = _vocabulary(1000, random.Random(42))
+    return [
+        rng.choice(QUESTION_TEMPLATES).format(f=rng.choice(FACILITIES), w=_filler(vocab, rng, 1))
+        for _ in range(num_questions)
+    ]
+
+
+# ---------------------------------------------------------
+# Полный перебор — эталон для recall@k
+# ---------------------------------------------------------
+def _top(scores: Dict[int, float], k: int) -> List[int]:
+    return [i for i, _ in sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:k]]
+
+
+def tfidf_reference(doc_tokens: List[Counter]) -> Tuple[Dict[str, float], List[float]]:
+    """idf слов и нормы TF-IDF векторов фрагментов — с теми же весами, что у TfidfMatrix."""
+    df = Counter()
+    for tokens in doc_tokens:
+        df.update(tokens.keys())
+    total = len(doc_tokens)
+    idf = {token: math.log((1 + total) / (1 + count)) + 1 for token, count in df.items()}
+    norms = [
+        math.sqrt(sum(((1 + math.log(tf)) * idf[token]) ** 2 for token, tf in tokens.items())) or 1.0
+        for tokens in doc_tokens
+    ]
+    return idf, norms
+
+
+def brute_force(index: HotelIndex, doc_tokens: List[Counter], question: str, k: int, mode: str,
+                proximity: bool = True, tfidf_stats=None) -> List[int]:
+    if mode in ("match", "bm25"):
+        q = index.query_terms(question)
+        scores = {}
+        for chunk_id, tokens in enumerate(doc_tokens):
+            score = 0.0
+            for token, weight in q.items():
+                tf = tokens.get(token)
+                if not tf:
+                    continue
+                if mode == "bm25":
+                    norm = index.norms[chunk_id]
+                    score += weight * index.lookup(token)[1] * tf * (BM25_K1 + 1) / (tf + norm)
+                else:
+                    score += weight
+            if score > 0:
+                scores[chunk_id] = score
+        if mode == "bm25" and proximity:
+            # близость слов — по всем фрагментам, а не только по верхушке BM25
+            for chunk_id, boost in index.proximity_scores(question, scores).items():
+                scores[chunk_id] += boost
+        return _top(scores, k)
+
+    if mode == "dense":
+        from dense import embed, MIN_SCORE
+        dense = index.dense()
+        sims = dense.vectors @ embed([question])[0]
+        return _top({int(dense.ids[i]): float(s) for i, s in enumerate(sims) if s >= MIN_SCORE}, k)
+
+    if mode == "hybrid":
+        depth = max(k * HYBRID_DEPTH, k)
+        fused = {}
+        # BM25-список гибрида — без бонуса за близость, как и в HotelIndex
+        for ranked in (brute_force(index, doc_tokens, question, depth, "bm25", proximity=False),
+                       brute_force(index, doc_tokens, question, depth, "dense")):
+            for place, chunk_id in enumerate(ranked):
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + place + 1)
+        return _top(fused, k)
+
+    # tfidf: косинус вопроса с каждым фрагментом (слова вопроса без исправления опечаток)
+    idf, norms = tfidf_stats or tfidf_reference(doc_tokens)
+    q = {token: (1 + math.log(tf)) * idf[token] for token, tf in Counter(tokenize(question)).items() if token in idf}
+    scores = {}
+    for chunk_id, tokens in enumerate(doc_tokens):
+        score = sum(weight * (1 + math.log(tokens[token])) * idf[token] for token, weight in q.items() if token in tokens)
+        if score > 0:
+            # фрагменты из тех же слов в другом порядке равны и в float32, а здесь разошлись бы
+            # в последних знаках из-за порядка суммирования — округляем, чтобы равенство решал номер
+            scores[chunk_id] = round(score / norms[chunk_id], 6)
+    return _top(scores, k)
+
+
+def _percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(p / 100 * len(ordered))) - 1)]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss в Linux — килобайты
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(search, questions: List[str], runs: int, reset=None) -> Dict:
+    """
+    Задержки по всем вопросам, runs прогонов; по каждой метрике берётся
+    медиана прогонов — один прогон слишком шумный для гейта регрессий.
+    reset вызывается перед каждым прогоном (сброс кэша запросов).
+    """
+    per_run = []
+    for _ in range(max(runs, 1)):
+        if reset is not None:
+            reset()
+        latencies = []
+        started = time.perf_counter()
+        for question in questions:
+            t = time.perf_counter()
+            search(question)
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - started
+        per_run.append({
+            "p50_ms": _percentile(latencies, 50) * 1000,
+            "p95_ms": _percentile(latencies, 95) * 1000,
+            "p99_ms": _percentile(latencies, 99) * 1000,
+            "qps": len(questions) / elapsed if elapsed else 0.0,
+        })
+    return {
+        key: round(statistics.median(r[key] for r in per_run), 1 if key == "qps" else 3)
+        for key in per_run[0]
+    }
+
+
+def _open_rag(corpus: List[str], workdir: str) -> "rag.SmartHotelRAG":
+    """SmartHotelRAG с одним отелем «bench» — корпус, записанный файлом знаний во workdir."""
+    with open(os.path.join(workdir, "bench.txt"), "w", encoding="utf-8") as f:
+        f.write("\n\n".join(corpus))
+    rag.KNOWLEDGE_DIR = workdir
+    rag.INDEX_DIR = os.path.join(workdir, ".index")
+    return rag.SmartHotelRAG()
+
+
+def run_size(num_chunks: int, modes: List[str], num_questions: int, recall_questions: int, top_k: int,
+             runs: int = 3, through_query: bool = False, budget: int = None) -> Dict:
+    corpus = synthetic_corpus(num_chunks)
+    questions = synthetic_questions(num_questions)
+
+    started = time.perf_counter()
+    index = HotelIndex(corpus)
+    result = {"chunks": num_chunks, "build_s": round(time.perf_counter() - started, 3), "modes": {}}
+    if not through_query:
+        del corpus
+
+    doc_tokens = None
+    for mode in modes:
+        # ленивые бэкенды (tfidf, dense) строятся на первом запросе — меряем отдельно
+        started = time.perf_counter()
+        index.rank(questions[0], top_k, mode)
+        warmup = time.perf_counter() - started
+
+        stats = {"warmup_s": round(warmup, 3)}
+        stats.update(_measure(lambda question: index.rank(question, top_k, mode), questions, runs))
+
+        if doc_tokens is None and mode != "dense":
+            doc_tokens = [Counter(tokenize(chunk)) for chunk in index.chunks]
+        tfidf_stats = tfidf_reference(doc_tokens) if mode == "tfidf" else None
+        found = expected = 0
+        for question in questions[:recall_questions]:
+            exact = set(brute_force(index, doc_tokens, question, top_k, mode, tfidf_stats=tfidf_stats))
+            found += len(exact & set(index.rank(question, top_k, mode)))
+            expected += len(exact)
+        stats[f"recall@{top_k}"] = round(found / expected, 4) if expected else 1.0
+        result["modes"][mode] = stats
+
+    if through_query:
+        del index, doc_tokens
+        with tempfile.TemporaryDirectory() as workdir:
+            started = time.perf_counter()
+            smart = _open_rag(corpus, workdir)
+            result["query_build_s"] = round(time.perf_counter() - started, 3)
+            for mode in modes:
+                # первый запрос открывает индекс отеля и строит ленивый бэкенд
+                started = time.perf_counter()
+                smart.query(questions[0], hotel="bench", top_k=top_k, ranking=mode, budget=budget)
+                stats = {"warmup_s": round(time.perf_counter() - started, 3)}
+                stats.update(_measure(
+                    lambda question: smart.query(question, hotel="bench", top_k=top_k, ranking=mode, budget=budget),
+                    questions, runs, reset=smart.cache.clear,
+                ))
+                stats["cache_hit_rate"] = smart.cache.stats()["hit_rate"]
+                result["modes"][f"query:{mode}"] = stats
+
+    result["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    return result
+
+
+def compare(results: List[Dict], baseline: List[Dict], max_regression: float, min_delta_ms: float = 0.5) -> List[str]:
+    """
+    Регрессии относительно эталона: падение recall или рост p95 больше чем
+    на max_regression и одновременно больше чем на min_delta_ms — на долях
+    миллисекунды 25% укладываются в шум.
+    """
+    problems = []
+    base = {r["chunks"]: r for r in baseline}
+    for r in results:
+        old = base.get(r["chunks"])
+        if not old:
+            continue
+        for mode, stats in r["modes"].items():
+            old_stats = old["modes"].get(mode)
+            if not old_stats:
+                continue
+            old_p95, p95 = old_stats["p95_ms"], stats["p95_ms"]
+            if p95 > old_p95 * (1 + max_regression) and p95 - old_p95 > min_delta_ms:
+                problems.append(f"{r['chunks']} {mode}: p95 {old_stats['p95_ms']} → {stats['p95_ms']} ms")
+            for key, value in stats.items():
+                if key.startswith("recall@") and value < old_stats.get(key, 0) - 0.01:
+                    problems.append(f"{r['chunks']} {mode}: {key} {old_stats[key]} → {value}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска SmartHotelRAG")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="размеры корпусов через запятую (до 1000000)")
+    parser.add_argument("--modes", default=",".join(RANKING_MODES), help="режимы ранжирования через запятую")
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--recall-questions", type=int, default=50, help="сколько вопросов проверять перебором")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--save", help="сохранить результаты в JSON")
+    parser.add_argument("--baseline", help="JSON прошлых результатов для сравнения")
+    parser.add_argument("--runs", type=int, default=3, help="прогонов на режим, задержки — медиана")
+    parser.add_argument("--query", action="store_true", help="ещё и через SmartHotelRAG.query")
+    parser.add_argument("--budget", type=int, default=0, help="бюджет контекста (токены) для --query, 0 — без упаковки")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="допустимый рост p95 (доля)")
+    parser.add_argument("--min-regression-ms", type=float, default=0.5, help="допустимый рост p95 (мс)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    modes = [m for m in args.modes.split(",") if m]
+    for mode in modes:
+        if mode not in RANKING_MODES:
+            parser.error(f"unknown mode: {mode}")
+
+    results = []
+    for size in sizes:
+        # отдельный процесс на размер: чистый пиковый RSS и освобождение памяти
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            r = pool.submit(
+                run_size, size, modes, args.questions, args.recall_questions, args.top_k,
+                args.runs, args.query, args.budget or None,
+            ).result()
+        results.append(r)
+
+        print(f"\n=== {size} фрагментов: сборка {r['build_s']} с, пиковый RSS {r['peak_rss_mb']} МБ ===")
+        print(f"{'режим':<14} {'прогрев,с':>9} {'p50,мс':>8} {'p95,мс':>8} {'p99,мс':>8} {'qps':>9} {'recall':>7}")
+        for mode, s in r["modes"].items():
+            print(f"{mode:<14} {s['warmup_s']:>9} {s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8} "
+                  f"{s['qps']:>9} {s.get(f'recall@{args.top_k}', '-'):>7}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            problems = compare(results, json.load(f), args.max_regression, args.min_regression_ms)
+        if problems:
+            print("\n❌ Регрессии:")
+            for problem in problems:
+                print(" -", problem)
+            return 1
+        print("\n✅ Регрессий нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
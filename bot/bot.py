@@ -1,4 +1,6 @@
 import os
+import time
+import asyncio
 import logging
 from typing import Optional
 from datetime import datetime
@@ -11,6 +13,7 @@ from aiogram.types import (
     ReplyKeyboardMarkup, KeyboardButton
 )
 from aiogram.client.default import DefaultBotProperties
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.storage.memory import MemoryStorage
@@ -20,7 +23,12 @@ from dotenv import load_dotenv
 
 # RAG + GigaChat
 from rag import SmartHotelRAG
-from gigachat_ai import ask_gigachat
+from rag_client import RagClient
+from context_packer import CONTEXT_TOKEN_BUDGET
+from watcher import KnowledgeWatcher
+from gigachat_ai import GIGACHAT_MODEL, astream_gigachat, aclose_gigachat
+from llm_cache import ResponseCache, cache_key
+from rate_limit import GigaChatBusy
 
 
 # ===================================================
@@ -37,9 +45,31 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 # ВАЖНО: base_url ВСЕГДА заканчивается на /api/
 API_BASE_URL = os.getenv("API_BASE_URL", "http://smarthotel_backend:8000/api/")
 
+# Как часто (сек) проверять knowledge/ на изменения; 0 — не следить
+RAG_RELOAD_INTERVAL = float(os.getenv("RAG_RELOAD_INTERVAL", "30"))
+
+# Адрес общего сервиса поиска (rag_service.py): http://host:port или unix:///путь;
+# пусто — индекс знаний держится в этом процессе
+RAG_SERVICE_URL = os.getenv("RAG_SERVICE_URL", "")
+
+# Сколько фрагментов достаём из RAG; в промпт из них идёт не больше RAG_CONTEXT_TOKENS токенов
+RAG_CONTEXT_CANDIDATES = int(os.getenv("RAG_CONTEXT_CANDIDATES", "8"))
+
+# Ключ GigaChat для ответов гостям (base64 client_id:secret, как в настройках площадки)
+GIGACHAT_AUTHORIZATION_KEY = os.getenv("GIGACHAT_AUTHORIZATION_KEY")
+GIGACHAT_SCOPE = os.getenv("GIGACHAT_SCOPE")
+
+# Ответ LLM показываем по мере генерации, правя сообщение не чаще раза в столько секунд
+# (Telegram ограничивает частоту правок в одном чате)
+BOT_STREAM_EDIT_INTERVAL = float(os.getenv("BOT_STREAM_EDIT_INTERVAL", "1.0"))
+STREAM_CURSOR = " ▌"
+STREAM_ERROR_TEXT = "⚠️ Ответ прервался. Повторите вопрос или уточните у администратора отеля."
+
 bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
 dp = Dispatcher(storage=MemoryStorage())
-rag = SmartHotelRAG()
+rag = RagClient(RAG_SERVICE_URL) if RAG_SERVICE_URL else SmartHotelRAG()
+# готовые ответы GigaChat на повторяющиеся промпты (отель + вопрос + контекст)
+llm_cache = ResponseCache()
 
 
 # Проверка: работает ли бот?
@@ -347,8 +377,18 @@ async def handle_message(message: Message, state: FSMContext):
         await start_booking(message, state)
         return
 
+    # поиск синхронный (локальный индекс или HTTP к сервису) — уводим из event loop
+    # FAQ отеля: уверенно узнанный вопрос получает готовый ответ без LLM
+    if selected_hotel_name:
+        faq_answer = await asyncio.to_thread(rag.answer, text, hotel=selected_hotel_name)
+        if faq_answer:
+            await message.answer(faq_answer, reply_markup=bottom_menu())
+            return
+
     # RAG
-    context = rag.query(text, hotel=selected_hotel_name) if selected_hotel_name else ""
+    context = await asyncio.to_thread(
+        rag.query, text, hotel=selected_hotel_name, top_k=RAG_CONTEXT_CANDIDATES, budget=CONTEXT_TOKEN_BUDGET,
+    ) if selected_hotel_name else ""
 
     if selected_hotel_name:
         prompt = (
@@ -359,8 +399,74 @@ async def handle_message(message: Message, state: FSMContext):
     else:
         prompt = "Ты — консьерж SmartHotel. Посоветуй выбрать отель через кнопку «Отели»."
 
-    answer = ask_gigachat(f"{prompt}\n\nКонтекст:\n{context}\n\nВопрос:\n{text}")
-    await message.answer(answer, reply_markup=bottom_menu())
+    prompt = f"{prompt}\n\nКонтекст:\n{context}\n\nВопрос:\n{text}"
+    key = cache_key(selected_hotel_name or "", GIGACHAT_MODEL, prompt)
+    cached = llm_cache.get(key)
+    if cached:
+        await message.answer(cached, reply_markup=bottom_menu())
+        return
+    try:
+        llm_cache.set(key, await answer_streaming(message, prompt, hotel=selected_hotel_name))
+    except GigaChatBusy as exc:
+        # лимиты запросов к GigaChat исчерпаны — честно просим подождать, а не молчим
+        await message.answer(
+            f"Сейчас много вопросов, повторите через {int(exc.retry_after) + 1} с.",
+            reply_markup=bottom_menu(),
+        )
+
+
+async def _edit_reply(reply: Message, text: str, parse_mode: Optional[str] = None):
+    try:
+        await reply.edit_text(text, parse_mode=parse_mode)
+    except TelegramBadRequest as exc:
+        # например, «message is not modified» — следующая правка всё равно придёт
+        logging.debug(f"Stream edit skipped: {exc}")
+
+
+async def _finish_reply(reply: Message, text: str):
+    """Итоговый текст — с HTML, как обычные ответы; если разметка битая — простым текстом."""
+    try:
+        await reply.edit_text(text)
+    except TelegramBadRequest:
+        await _edit_reply(reply, text)
+
+
+async def answer_streaming(message: Message, prompt: str, hotel: Optional[str] = None) -> str:
+    """
+    Ответ GigaChat по мере генерации: первое сообщение уходит с первыми словами,
+    дальше оно дописывается правками не чаще BOT_STREAM_EDIT_INTERVAL.
+    Промежуточный текст идёт без разметки: кусок ответа может оборвать HTML-тег
+    или «&» посередине. Возвращает полный текст ответа ("" — если GigaChat ничего не ответил).
+    """
+    reply, answer, last_edit = None, "", 0.0
+    try:
+        async for delta in astream_gigachat(
+            prompt, auth_key=GIGACHAT_AUTHORIZATION_KEY, scope=GIGACHAT_SCOPE, tenant=hotel or "",
+        ):
+            answer += delta
+            now = time.monotonic()
+            if reply is None:
+                reply = await message.answer(answer + STREAM_CURSOR, parse_mode=None, reply_markup=bottom_menu())
+                last_edit = now
+            elif now - last_edit >= BOT_STREAM_EDIT_INTERVAL:
+                await _edit_reply(reply, answer + STREAM_CURSOR)
+                last_edit = now
+    except Exception as exc:
+        # курсор не должен остаться висеть в чате: дописываем, что ответ оборвался
+        if reply is not None:
+            await _finish_reply(reply, f"{answer}\n\n{STREAM_ERROR_TEXT}")
+        elif not isinstance(exc, GigaChatBusy):  # про перегрузку ответит handle_message
+            await message.answer(STREAM_ERROR_TEXT, parse_mode=None, reply_markup=bottom_menu())
+        raise
+
+    if reply is None:
+        try:
+            await message.answer(answer or "Уточните у администратора отеля.", reply_markup=bottom_menu())
+        except TelegramBadRequest:
+            await message.answer(answer, parse_mode=None, reply_markup=bottom_menu())
+    else:
+        await _finish_reply(reply, answer)
+    return answer
 
 
 # ===================================================
@@ -569,9 +675,14 @@ async def open_tour(callback: CallbackQuery):
 # ЗАПУСК
 # ===================================================
 async def main():
-    await dp.start_polling(bot)
+    # при общем сервисе за файлами следит он сам
+    if RAG_RELOAD_INTERVAL > 0 and not RAG_SERVICE_URL:
+        KnowledgeWatcher(rag, interval=RAG_RELOAD_INTERVAL).start()
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await aclose_gigachat()
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
@@ -0,0 +1,50 @@
+from array import array
+from typing import Iterable, Iterator, Sequence
+
+
+class ChunkStore:
+    """
+    Фрагменты отеля одним непрерывным UTF-8 буфером и массивом смещений.
+
+    Вместо тысяч отдельных объектов str — два объекта на отель, поэтому
+    меньше накладных расходов на память и работы у сборщика мусора.
+    view() отдаёт memoryview-срез без копирования: контекст для LLM
+    склеивается прямо из буфера и декодируется один раз.
+    Тот же класс читает буфер из mmap-файла индекса (index_store).
+    """
+
+    def __init__(self, buffer, offsets: Sequence[int]):
+        self.buffer = buffer      # bytes, либо memoryview поверх mmap
+        self.offsets = offsets    # array("I") / memoryview.cast("I"), len = число фрагментов + 1
+        self._view = memoryview(buffer)
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str]) -> "ChunkStore":
+        buffer = bytearray()
+        offsets = array("I", [0])
+        for text in texts:
+            buffer += text.encode("utf-8")
+            offsets.append(len(buffer))
+        return cls(bytes(buffer), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def view(self, chunk_id: int) -> memoryview:
+        """Байты фрагмента без копирования."""
+        return self._view[self.offsets[chunk_id]:self.offsets[chunk_id + 1]]
+
+    def __getitem__(self, chunk_id: int) -> str:
+        return str(self.view(chunk_id), "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for chunk_id in range(len(self)):
+            yield self[chunk_id]
+
+    def join(self, chunk_ids: Iterable[int], sep: str = "\n") -> str:
+        """Склеивает фрагменты в одну строку: одно декодирование на весь контекст."""
+        return sep.encode("utf-8").join(self.view(chunk_id) for chunk_id in chunk_ids).decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._view) + self.offsets.itemsize * len(self.offsets)
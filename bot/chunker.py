@@ -0,0 +1,176 @@
+import os
+import re
+import json
+import codecs
+import hashlib
+import logging
+from typing import Iterable, Iterator, List, NamedTuple
+
+
+# Размер фрагмента и перекрытие соседних фрагментов одного абзаца (в символах)
+CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "500"))
+CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "80"))
+# Абзацы короче — заголовки вида «Платные услуги:», в индекс не идут
+MIN_CHUNK_CHARS = 40
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…;])\s+")
+
+logger = logging.getLogger(__name__)
+
+
+class Chunk(NamedTuple):
+    id: str      # стабильный id: источник + хэш содержимого, не зависит от позиции в файле
+    text: str
+    hash: str    # blake2b содержимого — по нему индексы понимают, что фрагмент не менялся
+
+
+def iter_lines(path: str) -> Iterator[str]:
+    """
+    Строки файла знаний. .txt читается потоково, построчно;
+    у .json берётся поле "text" (такие файлы маленькие и читаются целиком),
+    а пары вопрос-ответ из "faq" добавляются отдельными абзацами.
+    Файл, который не читается как UTF-8 или не того вида, пропускается целиком:
+    один испорченный файл не должен ронять загрузку остальных отелей.
+    """
+    if path.endswith(".json"):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as exc:  # UnicodeDecodeError — тоже ValueError
+            logger.warning(f"{path}: файл знаний пропущен ({exc})")
+            return
+        text = data.get("text", "") if isinstance(data, dict) else None
+        if not isinstance(text, str):
+            logger.warning(f"{path}: файл знаний пропущен (нет строкового поля \"text\")")
+            return
+        yield from text.splitlines()
+        # FAQ тоже в индекс: вопрос, сформулированный иначе, найдёт ответ через RAG
+        faq = data.get("faq", [])
+        for entry in faq if isinstance(faq, list) else []:
+            if isinstance(entry, dict) and isinstance(entry.get("answer"), str) and entry["answer"]:
+                questions = entry.get("questions")
+                yield ""
+                if isinstance(questions, list) and questions and isinstance(questions[0], str):
+                    yield questions[0]
+                yield entry["answer"]
+        return
+
+    try:
+        _check_utf8(path)
+        with open(path, "r", encoding="utf-8") as f:
+            yield from f
+    except (OSError, UnicodeDecodeError) as exc:
+        logger.warning(f"{path}: файл знаний пропущен ({exc})")
+        return
+
+
+def _check_utf8(path: str):
+    """
+    UnicodeDecodeError, если файл не в UTF-8 (например, cp1251). Проверяем до
+    чтения строк: иначе ошибка всплыла бы посреди файла, когда часть строк уже отдана.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            decoder.decode(block)
+    decoder.decode(b"", final=True)
+
+
+def _pieces(line: str, max_chars: int) -> List[str]:
+    """Режет слишком длинную строку по предложениям, затем по словам, затем жёстко."""
+    if len(line) <= max_chars:
+        return [line]
+
+    pieces = []
+    for sentence in _SENTENCE_END_RE.split(line):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        current = ""
+        for word in sentence.split():
+            while len(word) > max_chars:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(word[:max_chars])
+                word = word[max_chars:]
+            if current and len(current) + 1 + len(word) > max_chars:
+                pieces.append(current)
+                current = ""
+            current = f"{current} {word}" if current else word
+        if current:
+            pieces.append(current)
+    return [p for p in pieces if p]
+
+
+def _tail(text: str, overlap: int) -> str:
+    """Последние overlap символов, начиная с границы слова."""
+    if overlap <= 0:
+        return ""
+    if len(text) <= overlap:
+        return text
+    tail = text[-overlap:]
+    cut = tail.find(" ")
+    return tail[cut + 1:] if cut != -1 else tail
+
+
+def chunk_lines(
+    lines: Iterable[str],
+    max_chars: int = CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+    min_chars: int = MIN_CHUNK_CHARS,
+) -> Iterator[str]:
+    """
+    Потоковое разбиение на фрагменты с учётом абзацев.
+
+    Строки абзаца (до пустой строки) набираются во фрагмент, пока он не
+    превысит max_chars; следующий фрагмент того же абзаца начинается с
+    хвоста предыдущего длиной до overlap символов. Через границу абзаца
+    фрагменты не склеиваются и не перекрываются. В памяти держится только
+    текущий фрагмент, поэтому размер файла на неё не влияет.
+    """
+    chunk = ""
+    fresh = False  # есть ли во фрагменте что-то кроме перекрытия
+    # куски длинных строк оставляют место под перекрытие, чтобы оно не терялось
+    piece_chars = max(max_chars - overlap - 1, max_chars // 2)
+
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            if fresh and len(chunk) >= min_chars:
+                yield chunk
+            chunk, fresh = "", False
+            continue
+
+        for i, piece in enumerate(_pieces(line, piece_chars)):
+            sep = "\n" if i == 0 else " "
+            if chunk and len(chunk) + len(sep) + len(piece) > max_chars:
+                if fresh and len(chunk) >= min_chars:
+                    yield chunk
+                tail = _tail(chunk, overlap)
+                chunk = tail if tail and len(tail) + len(sep) + len(piece) <= max_chars else ""
+            chunk = f"{chunk}{sep}{piece}" if chunk else piece
+            fresh = True
+
+    if fresh and len(chunk) >= min_chars:
+        yield chunk
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def chunk_file(path: str, source: str = None, **kwargs) -> Iterator[Chunk]:
+    """
+    Фрагменты файла знаний со стабильными id вида «EcoHouse:<хэш>».
+    Повтор одного и того же текста в файле получает суффикс «#2», «#3»…
+    """
+    source = source or os.path.splitext(os.path.basename(path))[0]
+    seen = {}
+
+    for text in chunk_lines(iter_lines(path), **kwargs):
+        digest = content_hash(text)
+        count = seen.get(digest, 0) + 1
+        seen[digest] = count
+        chunk_id = f"{source}:{digest}" if count == 1 else f"{source}:{digest}#{count}"
+        yield Chunk(chunk_id, text, digest)
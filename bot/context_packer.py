@@ -0,0 +1,107 @@
+import os
+import math
+import hashlib
+from typing import Iterable, List, Tuple
+
+try:
+    from tokenizer import tokenize
+except ImportError:  # импорт из портала как bot.context_packer
+    from bot.tokenizer import tokenize
+
+
+# Сколько токенов контекста отдаём в промпт GigaChat
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKENS", "600"))
+# Грубая оценка без токенизатора модели: русский текст — около трёх символов на токен
+CHARS_PER_TOKEN = 3.0
+# Строки, у которых оценка сходства Жаккара по основам слов не ниже порога, считаются повтором
+NEAR_DUPLICATE_JACCARD = 0.7
+# Короткие строки («Платно», «Бесплатно») не сравниваем — повторяются по делу
+MIN_DEDUP_WORDS = 3
+
+# Bottom-k MinHash: подпись — SIGNATURE_SIZE наименьших хэшей основ строки
+SIGNATURE_SIZE = 64
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _word_hash(word: str) -> int:
+    # blake2b, а не hash(): хэш строк случаен в каждом процессе
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def minhash(words: Iterable[str]) -> Tuple[int, ...]:
+    """
+    Bottom-k MinHash-подпись множества основ: один хэш на слово вместо
+    десятков перестановок. Для строк короче SIGNATURE_SIZE слов подпись —
+    всё множество, и сходство считается точно.
+    """
+    return tuple(sorted({_word_hash(word) for word in words})[:SIGNATURE_SIZE])
+
+
+def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Оценка сходства Жаккара по двум подписям."""
+    union = sorted(set(first) | set(second))[:SIGNATURE_SIZE]
+    if not union:
+        return 0.0
+    first, second = set(first), set(second)
+    return sum(1 for h in union if h in first and h in second) / len(union)
+
+
+def _is_near_duplicate(signature: Tuple[int, ...], seen: List[Tuple[int, ...]], threshold: float) -> bool:
+    return any(similarity(signature, other) >= threshold for other in seen)
+
+
+def pack_context(
+    chunks: Iterable[str],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    threshold: float = NEAR_DUPLICATE_JACCARD,
+) -> str:
+    """
+    Собирает контекст для промпта из фрагментов, отсортированных по релевантности.
+
+    Фрагменты разбиваются на строки; строка, почти совпадающая с уже взятой
+    (MinHash-оценка сходства Жаккара не ниже threshold), выбрасывается. Дальше фрагменты жадно, по
+    убыванию релевантности, добавляются целиком, пока влезают в budget токенов;
+    не влезший фрагмент добавляется теми строками, что ещё помещаются.
+    """
+    seen_lines = set()
+    fingerprints: List[Tuple[int, ...]] = []
+    packed: List[str] = []
+    used = 0
+
+    def take(line: str, fingerprint):
+        nonlocal used
+        packed.append(line)
+        seen_lines.add(line)
+        if fingerprint is not None:
+            fingerprints.append(fingerprint)
+        used += estimate_tokens(line) + 1
+
+    for chunk in chunks:
+        fresh = []
+        for line in chunk.splitlines():
+            line = line.strip()
+            if not line or line in seen_lines or any(line == other for other, _ in fresh):
+                continue
+            fingerprint = None
+            words = tokenize(line)
+            if len(words) >= MIN_DEDUP_WORDS:
+                fingerprint = minhash(words)
+                chunk_prints = [other for _, other in fresh if other is not None]
+                if _is_near_duplicate(fingerprint, fingerprints + chunk_prints, threshold):
+                    continue
+            fresh.append((line, fingerprint))
+
+        cost = sum(estimate_tokens(line) + 1 for line, _ in fresh)
+        if used + cost <= budget:
+            for line, fingerprint in fresh:
+                take(line, fingerprint)
+            continue
+        # не влез целиком — берём строки, которые ещё помещаются; взятыми считаются только они
+        for line, fingerprint in fresh:
+            if used + estimate_tokens(line) + 1 <= budget:
+                take(line, fingerprint)
+
+    return "\n".join(packed)
@@ -0,0 +1,203 @@
+import os
+import zlib
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from tokenizer import tokenize
+
+
+# Размерность эмбеддинга и число корзин хэширования признаков
+DIM = 128
+BUCKETS = 1 << 14
+NGRAM = 3
+SEED = 20240601
+
+# Сколько кластеров IVF просматривать на запрос и с какого размера корпуса включать IVF
+NPROBE = int(os.getenv("RAG_DENSE_NPROBE", "16"))
+BRUTE_FORCE_LIMIT = 4096
+
+# Косинус ниже порога — шум случайной проекции (у несвязанных текстов ~0.15)
+MIN_SCORE = float(os.getenv("RAG_DENSE_MIN_SCORE", "0.25"))
+
+# Вес признака: триграммы ловят формы слов, основа — точное совпадение, понятие — синонимы
+NGRAM_WEIGHT = 0.5
+WORD_WEIGHT = 1.0
+CONCEPT_WEIGHT = 3.0
+
+# Маленький встроенный словарь понятий гостиничной тематики: слова одной группы
+# получают общий признак, поэтому «с собакой» находит «питомцы»
+CONCEPTS = {
+    "pet": "собака собачка пес кошка кот котик питомец питомцы животное животные зверь",
+    "parking": "парковка стоянка паркинг машина автомобиль авто",
+    "internet": "интернет wifi wi fi вайфай вай фай",
+    "food": "завтрак обед ужин питание еда кафе ресторан кухня",
+    "checkin": "заезд заселение заселиться заехать",
+    "checkout": "выезд выселение выехать",
+    "child": "ребенок ребёнок дети детский малыш малыши кроватка",
+    "pool": "бассейн плавание купание",
+    "sauna": "баня сауна хамам парная",
+    "transfer": "трансфер такси аэропорт вокзал довезти",
+    "price": "цена стоимость стоит руб рублей оплата",
+}
+_CONCEPT_OF = {token: concept for concept, words in CONCEPTS.items() for token in tokenize(words)}
+
+_projection = None
+
+
+def _bucket(feature: str) -> int:
+    # crc32, а не hash(): встроенный хэш строк случаен в каждом процессе
+    return zlib.crc32(feature.encode("utf-8")) % BUCKETS
+
+
+def projection() -> np.ndarray:
+    """Случайная ±1/√DIM проекция корзин в DIM измерений (общая на процесс, детерминированная)."""
+    global _projection
+    if _projection is None:
+        rng = np.random.default_rng(SEED)
+        signs = rng.integers(0, 2, size=(BUCKETS, DIM), dtype=np.int8) * 2 - 1
+        _projection = signs.astype(np.float32) / np.sqrt(DIM, dtype=np.float32)
+    return _projection
+
+
+@lru_cache(maxsize=65536)
+def _token_features(token: str) -> Tuple[Tuple[int, float], ...]:
+    padded = f"<{token}>"
+    feats = [(_bucket(f"w:{token}"), WORD_WEIGHT)]
+    feats += [(_bucket(f"g:{padded[i:i + NGRAM]}"), NGRAM_WEIGHT) for i in range(max(len(padded) - NGRAM + 1, 1))]
+    concept = _CONCEPT_OF.get(token)
+    if concept:
+        feats.append((_bucket(f"c:{concept}"), CONCEPT_WEIGHT))
+    return tuple(feats)
+
+
+def features(text: str) -> List[Tuple[int, float]]:
+    """Хэшированные признаки: основы слов, символьные триграммы основ и понятия."""
+    counts = {}
+    for token in tokenize(text):
+        for bucket, weight in _token_features(token):
+            counts[bucket] = counts.get(bucket, 0.0) + weight
+    return list(counts.items())
+
+
+def embed(texts: Iterable[str]) -> np.ndarray:
+    """Эмбеддинги текстов: (число текстов × DIM), строки нормированы по L2."""
+    rows, cols, vals = [], [], []
+    n = 0
+    for row, text in enumerate(texts):
+        for bucket, weight in features(text):
+            rows.append(row)
+            cols.append(bucket)
+            vals.append(weight)
+        n = row + 1
+
+    hashed = sparse.csr_matrix((vals, (rows, cols)), shape=(n, BUCKETS), dtype=np.float32)
+    vectors = np.asarray(hashed.dot(projection()), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class DenseIndex:
+    """
+    Приближённый поиск ближайших соседей (IVF) по косинусу.
+
+    Векторы кластеризуются сферическим k-means на √N центроидов и хранятся
+    подряд по кластерам; запрос сравнивается с центроидами и сканирует только
+    NPROBE ближайших кластеров. Небольшие корпуса ищутся перебором.
+    """
+
+    def __init__(self, vectors: np.ndarray, nprobe: int = NPROBE, iterations: int = 8):
+        self.nprobe = nprobe
+        n = len(vectors)
+
+        if n < BRUTE_FORCE_LIMIT:
+            self.centroids = None
+            self.vectors = vectors
+            self.ids = np.arange(n)
+            return
+
+        nlist = int(np.sqrt(n))
+        rng = np.random.default_rng(SEED)
+        sample = vectors[rng.choice(n, size=min(n, nlist * 32), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=nlist) == 0
+            # пустой кластер переносим на случайную точку выборки
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 16384):
+            assign[start:start + 16384] = np.argmax(vectors[start:start + 16384] @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind="stable")
+        self.centroids = centroids.astype(np.float32)
+        self.vectors = np.ascontiguousarray(vectors[order])
+        self.ids = order
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist))))
+
+    @property
+    def nbytes(self) -> int:
+        size = self.vectors.nbytes + self.ids.nbytes
+        if self.centroids is not None:
+            size += self.centroids.nbytes + self.offsets.nbytes
+        return size
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], **kwargs) -> "DenseIndex":
+        return cls(embed(texts), **kwargs)
+
+    def save(self, path: str):
+        """Пишет массивы индекса в .npz (через временный файл — читатели не видят половину)."""
+        arrays = {"vectors": self.vectors, "ids": self.ids}
+        if self.centroids is not None:
+            arrays.update(centroids=self.centroids, offsets=self.offsets)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, num_chunks: int, nprobe: int = NPROBE) -> "DenseIndex":
+        """Индекс из save(); ValueError, если файл от другого корпуса или другой размерности."""
+        with np.load(path) as data:
+            vectors = data["vectors"]
+            if vectors.shape != (num_chunks, DIM):
+                raise ValueError(f"Dense index does not match the corpus: {path}")
+            index = cls.__new__(cls)
+            index.nprobe = nprobe
+            index.vectors = vectors
+            index.ids = data["ids"]
+            index.centroids = data["centroids"] if "centroids" in data.files else None
+            if index.centroids is not None:
+                index.offsets = data["offsets"]
+        return index
+
+    def search(self, question: str, top_k: int = 3) -> List[Tuple[int, float]]:
+        """[(номер фрагмента, косинус)] по убыванию близости."""
+        if top_k <= 0 or len(self.ids) == 0:
+            return []
+        query = embed([question])[0]
+        if not query.any():
+            return []
+
+        if self.centroids is None:
+            positions = np.arange(len(self.ids))
+        else:
+            nprobe = min(self.nprobe, len(self.centroids))
+            probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+            positions = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in probe])
+
+        scores = self.vectors[positions] @ query
+        k = min(top_k, len(positions))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(self.ids[positions[i]]), float(scores[i])) for i in top if scores[i] >= MIN_SCORE]
@@ -0,0 +1,88 @@
+import os
+import json
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+from tokenizer import tokenize
+
+
+# С какой уверенности (сходство Жаккара по основам слов) отвечаем из FAQ без LLM
+FAQ_MIN_SCORE = float(os.getenv("RAG_FAQ_MIN_SCORE", "0.75"))
+
+
+def load_entries(path: str) -> List[Dict]:
+    """
+    Записи FAQ из JSON-файла знаний отеля:
+    {"text": "...", "faq": [{"questions": [...], "keywords": [...], "answer": "..."}]}.
+    keywords — необязательные короткие формулировки намерения («парковка»).
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    entries = data.get("faq", []) if isinstance(data, dict) else []
+    return [e for e in entries if isinstance(e, dict) and e.get("answer")]
+
+
+class FaqIndex:
+    """
+    Готовые ответы на частые вопросы отеля.
+
+    Каждая формулировка вопроса (и набор keywords) нормализуется в множество
+    основ. Сначала ищем точное совпадение множества в хэш-таблице, затем —
+    лучшую формулировку по сходству Жаккара среди записей, у которых есть
+    общие с вопросом основы (через обратный индекс). Ответ отдаётся, только
+    если сходство не ниже min_score и лучшая запись одна.
+    """
+
+    def __init__(self, entries: Iterable[Dict], min_score: float = FAQ_MIN_SCORE):
+        self.min_score = min_score
+        self.answers: List[str] = []
+        self._exact: Dict[FrozenSet[str], int] = {}
+        self._variants: List[List[FrozenSet[str]]] = []
+        self._by_token: Dict[str, List[int]] = {}
+
+        for entry in entries:
+            entry_id = len(self.answers)
+            self.answers.append(entry["answer"])
+            phrases = list(entry.get("questions", []))
+            if entry.get("keywords"):
+                phrases.append(" ".join(entry["keywords"]))
+
+            variants = []
+            for phrase in phrases:
+                stems = frozenset(tokenize(phrase))
+                if not stems:
+                    continue
+                variants.append(stems)
+                # одинаковая формулировка у двух записей — неоднозначна, точным совпадением не считаем
+                self._exact[stems] = entry_id if self._exact.get(stems, entry_id) == entry_id else -1
+                for token in stems:
+                    ids = self._by_token.setdefault(token, [])
+                    if not ids or ids[-1] != entry_id:
+                        ids.append(entry_id)
+            self._variants.append(variants)
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def match(self, question: str) -> Optional[str]:
+        """Готовый ответ или None, если уверенного совпадения нет."""
+        stems = frozenset(tokenize(question))
+        if not stems:
+            return None
+
+        entry_id = self._exact.get(stems)
+        if entry_id is not None and entry_id >= 0:
+            return self.answers[entry_id]
+
+        candidates = {entry_id for token in stems for entry_id in self._by_token.get(token, ())}
+        scores = sorted(
+            (max(len(stems & v) / len(stems | v) for v in self._variants[entry_id]), entry_id)
+            for entry_id in candidates
+        )
+        if not scores or scores[-1][0] < self.min_score:
+            return None
+        if len(scores) > 1 and scores[-2][0] == scores[-1][0]:
+            return None  # две записи одинаково похожи — пусть решает LLM
+        return self.answers[scores[-1][1]]
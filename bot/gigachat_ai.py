@@ -1,12 +1,20 @@
 import os
-import requests
+import json
 import time
-import warnings
 import uuid
-import base64
+import queue
+import asyncio
+import threading
+import httpx
 from pathlib import Path
 from dotenv import load_dotenv
-from urllib3.exceptions import InsecureRequestWarning
+
+try:
+    from llm_cache import cache_key
+    from rate_limit import GigaChatRateLimited, LlmLimiter, parse_retry_after
+except ImportError:  # модуль импортирован порталом как bot.gigachat_ai
+    from bot.llm_cache import cache_key
+    from bot.rate_limit import GigaChatRateLimited, LlmLimiter, parse_retry_after
 
 # Грузим .env и из корня проекта, и из backend (рядом с manage.py)
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -19,11 +27,90 @@ AUTH_URL = "https://ngw.devices.sberbank.ru:9443/api/v2/oauth"
 CHAT_URL = "https://gigachat.devices.sberbank.ru/api/v1/chat/completions"
 DEFAULT_SCOPE = "GIGACHAT_API_PERS"
 GIGACHAT_VERIFY_SSL = False
+GIGACHAT_MODEL = os.getenv("GIGACHAT_MODEL", "GigaChat:latest")
+
+# Пул соединений: TLS-рукопожатие делается один раз, дальше запросы идут по keep-alive
+GIGACHAT_TIMEOUT = float(os.getenv("GIGACHAT_TIMEOUT", "30"))
+GIGACHAT_MAX_CONNECTIONS = int(os.getenv("GIGACHAT_MAX_CONNECTIONS", "20"))
+GIGACHAT_MAX_KEEPALIVE = int(os.getenv("GIGACHAT_MAX_KEEPALIVE", "10"))
+GIGACHAT_KEEPALIVE_EXPIRY = float(os.getenv("GIGACHAT_KEEPALIVE_EXPIRY", "60"))
+
+# HTTP/2 нужен пакет h2 (httpx[http2]); без него работаем по HTTP/1.1
+try:
+    import h2  # noqa: F401
+    GIGACHAT_HTTP2 = os.getenv("GIGACHAT_HTTP2", "1") != "0"
+except ImportError:
+    GIGACHAT_HTTP2 = False
+
+# Токен обновляется в фоне за столько секунд до истечения, чтобы запросы гостей не ждали OAuth
+GIGACHAT_TOKEN_REFRESH_MARGIN = float(os.getenv("GIGACHAT_TOKEN_REFRESH_MARGIN", "120"))
+# Токен, которому осталось меньше, уже не отдаём — ждём новый
+TOKEN_EXPIRY_SKEW = 30
+
+
+# ---------------------------------------------------------
+# Event loop владельца HTTP-клиента
+# ---------------------------------------------------------
+# httpx.AsyncClient привязан к циклу, в котором открыты его соединения. Поэтому
+# клиент живёт в одном фоновом цикле: бот отправляет туда корутины из своего цикла,
+# потоки портала — через синхронную обёртку. Пул и токены общие для всех.
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+# лимиты одновременности и частоты запросов к чату (rate_limit.py); тоже живут в этом цикле
+_limiter = LlmLimiter()
+
+
+def _owner_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="gigachat-loop", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def _http() -> httpx.AsyncClient:
+    """Общий AsyncClient; вызывается только из цикла-владельца."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=GIGACHAT_HTTP2,
+            verify=GIGACHAT_VERIFY_SSL,
+            timeout=httpx.Timeout(GIGACHAT_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=GIGACHAT_MAX_CONNECTIONS,
+                max_keepalive_connections=GIGACHAT_MAX_KEEPALIVE,
+                keepalive_expiry=GIGACHAT_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+def _run_sync(coro):
+    """Выполнить корутину в цикле-владельце и дождаться результата (для синхронного кода)."""
+    return asyncio.run_coroutine_threadsafe(coro, _owner_loop()).result()
+
+
+async def _run_async(coro):
+    """Выполнить корутину в цикле-владельце, не блокируя цикл вызывающего."""
+    if asyncio.get_running_loop() is _loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _owner_loop()))
+
 
-ACCESS_TOKEN = None
-EXPIRES_AT = 0
-CACHE_KEY = None  # cache key: (auth_key, scope)
-warnings.filterwarnings("ignore", category=InsecureRequestWarning)
+async def _aclose():
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+
+
+async def aclose_gigachat():
+    """Закрыть соединения пула (при остановке бота)."""
+    if _loop is not None:
+        await _run_async(_aclose())
 
 
 def _get_basic(auth_key: str | None):
@@ -40,26 +127,34 @@ def _get_basic(auth_key: str | None):
     return auth_key, auth_key
 
 
-def get_gigachat_access_token(auth_key: str | None, scope: str | None = None, force_refresh=False):
-    """
-    Получение Access Token от GigaChat (OAuth).
-    Возвращает token или бросает RuntimeError.
-    """
-    global ACCESS_TOKEN, EXPIRES_AT, CACHE_KEY
+# ---------------------------------------------------------
+# Токены: кэш по (auth_key, scope)
+# ---------------------------------------------------------
+class _CachedToken:
+    """Токен одной пары (auth_key, scope); меняется только в цикле-владельце."""
 
-    basic, cache_key = _get_basic(auth_key)
-    aurl = AUTH_URL
-    scope_value = (scope or DEFAULT_SCOPE).strip() or DEFAULT_SCOPE
+    __slots__ = ("token", "expires_at", "fetched_at", "last_used", "lock", "timer", "refresh_task")
 
-    print("[GIGACHAT TOKEN] requesting token, force_refresh:", force_refresh, "cached:", bool(ACCESS_TOKEN))
+    def __init__(self):
+        self.token = None
+        self.expires_at = 0.0
+        self.fetched_at = 0.0
+        self.last_used = 0.0
+        self.lock = asyncio.Lock()  # одно обновление на ключ, остальные ждут его результат
+        self.timer = None
+        self.refresh_task = None
+
+    def valid(self, now: float) -> bool:
+        return bool(self.token) and self.expires_at - TOKEN_EXPIRY_SKEW > now
 
-    now = time.time()
-    if not force_refresh and ACCESS_TOKEN and CACHE_KEY == (cache_key, scope_value) and EXPIRES_AT - 30 > now:
-        return ACCESS_TOKEN
 
-    if force_refresh:
-        print("[GIGACHAT TOKEN] refresh requested (force_refresh=True)")
+# у каждой площадки свой ключ — токены разных площадок не вытесняют друг друга
+_tokens: dict = {}
 
+
+async def _request_token(basic: str, scope_value: str, entry: _CachedToken):
+    """OAuth-запрос нового токена; вызывается под entry.lock."""
+    aurl = AUTH_URL
     headers = {
         "Content-Type": "application/x-www-form-urlencoded",
         "Accept": "application/json",
@@ -69,44 +164,107 @@ def get_gigachat_access_token(auth_key: str | None, scope: str | None = None, fo
     print("[GIGACHAT TOKEN] auth header len:", len(basic), "prefix:", basic[:3], "suffix:", basic[-3:])
 
     data = f"scope={scope_value}"
+    now = time.time()
 
     try:
-        resp = requests.post(aurl, headers=headers, data=data, verify=GIGACHAT_VERIFY_SSL, timeout=30)
-    except Exception as exc:
+        resp = await _http().post(aurl, headers=headers, content=data)
+    except httpx.HTTPError as exc:
         print("[DIAG] GigaChat token exception:", type(exc).__name__, exc)
         raise RuntimeError(f"GIGACHAT EXCEPTION: {type(exc).__name__}: {exc}")
 
     print("[GIGACHAT TOKEN] url:", aurl)
     print("[GIGACHAT TOKEN] headers (sans auth):", {k: v for k, v in headers.items() if k.lower() != "authorization"})
     print("[GIGACHAT TOKEN] body:", data)
-    print("[GIGACHAT TOKEN] status:", resp.status_code)
-    print("[GIGACHAT TOKEN] resp body:", (resp.text or "")[:500])
+    print("[GIGACHAT TOKEN] status:", resp.status_code, resp.http_version)
 
     if resp.status_code != 200:
         raise RuntimeError(f"GIGACHAT ERROR: status={resp.status_code}, body={(resp.text or '')[:500]}")
 
-    token = resp.json().get("access_token")
-    expires_in = resp.json().get("expires_in", 600)
-    ACCESS_TOKEN = token
-    CACHE_KEY = (cache_key, scope_value)
-    EXPIRES_AT = now + expires_in
-    return token
+    body = resp.json()
+    entry.token = body.get("access_token")
+    # GigaChat отдаёт expires_at в миллисекундах; expires_in — на случай другого OAuth-шлюза
+    if body.get("expires_at"):
+        entry.expires_at = body["expires_at"] / 1000
+    else:
+        entry.expires_at = now + body.get("expires_in", 600)
+    entry.fetched_at = time.time()
+
+    if entry.timer is not None:
+        entry.timer.cancel()
+    delay = max(entry.expires_at - now - GIGACHAT_TOKEN_REFRESH_MARGIN, 1.0)
+    entry.timer = asyncio.get_running_loop().call_later(delay, _schedule_refresh, basic, scope_value)
+
+
+def _schedule_refresh(basic: str, scope_value: str):
+    entry = _tokens.get((basic, scope_value))
+    # токен площадки, к которой с прошлого обновления не обращались, не продлеваем
+    if entry is None or entry.last_used < entry.fetched_at or entry.lock.locked():
+        return
+    entry.refresh_task = asyncio.get_running_loop().create_task(_refresh_in_background(basic, scope_value, entry))
 
 
-def _chat_request(chat_url, headers, payload):
+async def _refresh_in_background(basic: str, scope_value: str, entry: _CachedToken):
     try:
-        resp = requests.post(
-            chat_url or CHAT_URL,
-            headers=headers,
-            json=payload,
-            timeout=30,
-            verify=False,
-        )
-    except Exception as exc:
+        async with entry.lock:
+            await _request_token(basic, scope_value, entry)
+        print("[GIGACHAT TOKEN] refreshed ahead of expiry")
+    except RuntimeError as exc:
+        # не страшно: ближайший запрос получит токен сам
+        print("[GIGACHAT TOKEN] background refresh failed:", exc)
+    finally:
+        entry.refresh_task = None
+
+
+async def _fetch_access_token(auth_key: str | None, scope: str | None = None, force_refresh=False, stale: str = None):
+    """
+    Токен из кэша по (auth_key, scope). Если его нужно получить заново, запрос
+    делает один вызов, а одновременные ждут его под блокировкой ключа.
+    stale — токен, на который чат ответил 401: обновляем, только если в кэше всё ещё он.
+    """
+    basic, cache_key = _get_basic(auth_key)
+    scope_value = (scope or DEFAULT_SCOPE).strip() or DEFAULT_SCOPE
+
+    key = (cache_key, scope_value)
+    entry = _tokens.get(key)
+    if entry is None:
+        entry = _tokens[key] = _CachedToken()
+
+    requested = entry.last_used = time.time()
+    if not force_refresh and stale is None and entry.valid(requested):
+        return entry.token
+
+    async with entry.lock:
+        # пока ждали блокировку, токен мог обновить другой запрос
+        if entry.valid(time.time()) and (
+            entry.fetched_at >= requested or not (force_refresh or entry.token == stale)
+        ):
+            return entry.token
+        print("[GIGACHAT TOKEN] requesting token, force_refresh:", force_refresh, "cached:", bool(entry.token))
+        await _request_token(basic, scope_value, entry)
+        return entry.token
+
+
+async def aget_gigachat_access_token(auth_key: str | None, scope: str | None = None, force_refresh=False):
+    """Асинхронный get_gigachat_access_token."""
+    return await _run_async(_fetch_access_token(auth_key, scope, force_refresh))
+
+
+def get_gigachat_access_token(auth_key: str | None, scope: str | None = None, force_refresh=False):
+    """
+    Получение Access Token от GigaChat (OAuth).
+    Возвращает token или бросает RuntimeError.
+    """
+    return _run_sync(_fetch_access_token(auth_key, scope, force_refresh))
+
+
+async def _chat_request(chat_url, headers, payload):
+    try:
+        resp = await _http().post(chat_url or CHAT_URL, headers=headers, json=payload)
+    except httpx.HTTPError as exc:
         print("[DIAG] GigaChat request exception:", type(exc).__name__, exc)
         raise RuntimeError(f"GIGACHAT EXCEPTION: {type(exc).__name__}: {exc}")
 
-    print("[GIGACHAT CHAT] status:", resp.status_code)
+    print("[GIGACHAT CHAT] status:", resp.status_code, resp.http_version)
     print("[GIGACHAT CHAT] body:", (resp.text or "")[:500])
 
     if resp.status_code == 200:
@@ -118,38 +276,269 @@ def _chat_request(chat_url, headers, payload):
             print("[DIAG] raw response snippet:", (resp.text or "")[:300])
             raise RuntimeError(f"GIGACHAT ERROR: status=200, body={(resp.text or '')[:500]}")
 
+    if resp.status_code == 429:
+        _rate_limited(resp.headers.get("Retry-After"), resp.text or "")
     raise RuntimeError(f"GIGACHAT ERROR: status={resp.status_code}, body={(resp.text or '')[:500]}")
 
 
-def ask_gigachat(prompt: str, auth_key: str | None = None, client_id: str | None = None, chat_url: str | None = None, scope: str | None = None):
-    """Отправка user-prompt в GigaChat"""
+def _rate_limited(retry_after: str | None, body: str):
+    """429 от GigaChat; паузу площадке ставит _limited — здесь неизвестно, чей это ключ."""
+    seconds = parse_retry_after(retry_after)
+    raise GigaChatRateLimited(f"GIGACHAT ERROR: status=429, body={body[:500]}", retry_after=seconds)
+
+
+async def _limited(tenant: str, call):
+    """
+    call() под лимитами _limiter. На 429 площадка tenant (её ключ) ставится на паузу
+    Retry-After — остальные площадки продолжают работать, — и делается одна повторная
+    попытка, если она укладывается в тот же дедлайн (иначе GigaChatBusy сразу).
+    """
+    deadline = _limiter.deadline()
+    for attempt in range(2):
+        try:
+            async with _limiter.slot(tenant, deadline):
+                return await call()
+        except GigaChatRateLimited as exc:
+            _limiter.pause(tenant, exc.retry_after)
+            # tenant может быть самим ключом авторизации — в лог его не пишем
+            print("[GIGACHAT] 429 from chat, pausing this tenant for", exc.retry_after, "s")
+            if attempt:
+                raise
+
+
+def _payload(prompt: str, stream: bool = False) -> dict:
+    payload = {
+        "model": GIGACHAT_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.3
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
 
+async def _ask(prompt: str, auth_key: str | None, chat_url: str | None, scope: str | None):
     auth_key = (auth_key or "").strip()
     if not auth_key:
         raise RuntimeError("GIGACHAT ERROR: authorization_key not provided")
 
-    token = get_gigachat_access_token(auth_key=auth_key, scope=scope, force_refresh=False)
+    token = await _fetch_access_token(auth_key=auth_key, scope=scope, force_refresh=False)
 
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json",
     }
 
-    payload = {
-        "model": "GigaChat:latest",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3
-    }
+    payload = _payload(prompt)
 
     try:
-        content, resp = _chat_request(chat_url, headers, payload)
+        content, resp = await _chat_request(chat_url, headers, payload)
         return content
     except RuntimeError as exc:
         # если 401 — пробуем один refresh
         if "status=401" in str(exc):
             print("[GIGACHAT] received 401 from chat, refreshing token once")
-            token = get_gigachat_access_token(auth_key=auth_key, scope=scope, force_refresh=True)
+            token = await _fetch_access_token(auth_key=auth_key, scope=scope, stale=token)
             headers["Authorization"] = f"Bearer {token}"
-            content, resp = _chat_request(chat_url, headers, payload)
+            content, resp = await _chat_request(chat_url, headers, payload)
             return content
         raise
+
+
+# ---------------------------------------------------------
+# Склейка одинаковых запросов, которые уже в пути
+# ---------------------------------------------------------
+# Пока промпт с тем же отпечатком (ключ, scope, адрес, модель, нормализованный текст)
+# ждёт ответа, повторные вызовы не идут в GigaChat, а ждут тот же запрос. Словари
+# живут в цикле-владельце, куда приходят и бот, и потоки портала.
+_inflight: dict = {}
+_inflight_streams: dict = {}
+
+
+def _tenant(tenant, auth_key: str | None) -> str:
+    """Площадка для лимитов: явная (отель бота, id площадки портала) или её ключ GigaChat."""
+    return str(tenant) if tenant is not None else (auth_key or "").strip()
+
+
+def _flight_key(prompt: str, auth_key: str | None, chat_url: str | None, scope: str | None) -> str:
+    return cache_key(f"{(auth_key or '').strip()}/{scope or DEFAULT_SCOPE}/{chat_url or CHAT_URL}", GIGACHAT_MODEL, prompt)
+
+
+class _Flight:
+    """Запрос в пути и число ждущих его вызовов."""
+
+    __slots__ = ("task", "waiters", "chunks", "subscribers")
+
+    def __init__(self):
+        self.task = None
+        self.waiters = 0
+        self.chunks = []        # для потоков: уже полученные куски — опоздавшим
+        self.subscribers = []   # для потоков: emit() каждого читателя
+
+    def broadcast(self, item):
+        self.chunks.append(item)
+        for emit in list(self.subscribers):
+            emit(item)
+
+
+def _start_flight(flights: dict, key: str, run) -> _Flight:
+    """run(flight) — корутина самого запроса."""
+    flight = _Flight()
+    flight.task = asyncio.get_running_loop().create_task(run(flight))
+    flights[key] = flight
+    flight.task.add_done_callback(lambda task: flights.pop(key, None) if flights.get(key) is flight else None)
+    return flight
+
+
+async def _join(flight: _Flight):
+    """Дождаться общего запроса; ушёл последний ждущий — запрос отменяется."""
+    flight.waiters += 1
+    try:
+        # shield: отмена одного ждущего не должна отменять ответ остальным
+        return await asyncio.shield(flight.task)
+    finally:
+        flight.waiters -= 1
+        if not flight.waiters and not flight.task.done():
+            flight.task.cancel()
+
+
+async def _ask_coalesced(prompt: str, auth_key: str | None, chat_url: str | None, scope: str | None, tenant):
+    key = _flight_key(prompt, auth_key, chat_url, scope)
+    flight = _inflight.get(key)
+    if flight is None:
+        flight = _start_flight(
+            _inflight, key, lambda flight: _limited(_tenant(tenant, auth_key), lambda: _ask(prompt, auth_key, chat_url, scope)),
+        )
+    else:
+        print("[GIGACHAT] joined in-flight request, waiting:", flight.waiters + 1)
+    return await _join(flight)
+
+
+async def ask_gigachat_async(prompt: str, auth_key: str | None = None, client_id: str | None = None, chat_url: str | None = None, scope: str | None = None, tenant=None):
+    """Отправка user-prompt в GigaChat без блокировки event loop"""
+    return await _run_async(_ask_coalesced(prompt, auth_key, chat_url, scope, tenant))
+
+
+def ask_gigachat(prompt: str, auth_key: str | None = None, client_id: str | None = None, chat_url: str | None = None, scope: str | None = None, tenant=None):
+    """Отправка user-prompt в GigaChat (синхронно — для портала)"""
+    return _run_sync(_ask_coalesced(prompt, auth_key, chat_url, scope, tenant))
+
+
+# ---------------------------------------------------------
+# Потоковые ответы (SSE, "stream": true)
+# ---------------------------------------------------------
+_STREAM_END = object()
+
+
+async def _stream(prompt: str, auth_key: str | None, chat_url: str | None, scope: str | None, emit):
+    """Читает SSE-ответ GigaChat и передаёт каждый кусок текста в emit()."""
+    auth_key = (auth_key or "").strip()
+    if not auth_key:
+        raise RuntimeError("GIGACHAT ERROR: authorization_key not provided")
+
+    token = await _fetch_access_token(auth_key=auth_key, scope=scope, force_refresh=False)
+    payload = _payload(prompt, stream=True)
+
+    for attempt in range(2):
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream",
+        }
+        try:
+            async with _http().stream("POST", chat_url or CHAT_URL, headers=headers, json=payload) as resp:
+                print("[GIGACHAT STREAM] status:", resp.status_code, resp.http_version)
+                if resp.status_code == 401 and not attempt:
+                    # до первого куска ответа ещё можно обновить токен и повторить
+                    print("[GIGACHAT] received 401 from chat, refreshing token once")
+                    token = await _fetch_access_token(auth_key=auth_key, scope=scope, stale=token)
+                    continue
+                if resp.status_code != 200:
+                    body = (await resp.aread()).decode("utf-8", "replace")
+                    if resp.status_code == 429:
+                        _rate_limited(resp.headers.get("Retry-After"), body)
+                    raise RuntimeError(f"GIGACHAT ERROR: status={resp.status_code}, body={body[:500]}")
+
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    except (ValueError, KeyError, IndexError) as exc:
+                        print("[DIAG] stream parse error:", type(exc).__name__, data[:300])
+                        raise RuntimeError(f"GIGACHAT ERROR: bad stream chunk: {data[:300]}")
+                    if delta:
+                        emit(delta)
+                return
+        except httpx.HTTPError as exc:
+            print("[DIAG] GigaChat stream exception:", type(exc).__name__, exc)
+            raise RuntimeError(f"GIGACHAT EXCEPTION: {type(exc).__name__}: {exc}")
+
+
+async def _pump(prompt: str, auth_key: str | None, chat_url: str | None, scope: str | None, tenant, emit):
+    """
+    _stream в цикле-владельце: ошибка и конец потока тоже уходят в emit().
+    Одинаковые потоки в пути делят один запрос: новый читатель получает уже
+    пришедшие куски и дальше — всё, что придёт.
+    """
+    key = _flight_key(prompt, auth_key, chat_url, scope)
+    try:
+        flight = _inflight_streams.get(key)
+        if flight is None:
+            flight = _start_flight(
+                _inflight_streams, key, lambda flight: _limited(
+                    _tenant(tenant, auth_key), lambda: _stream(prompt, auth_key, chat_url, scope, flight.broadcast),
+                ),
+            )
+        else:
+            print("[GIGACHAT] joined in-flight stream, readers:", flight.waiters + 1)
+        for chunk in flight.chunks:
+            emit(chunk)
+        flight.subscribers.append(emit)
+        try:
+            await _join(flight)
+        finally:
+            flight.subscribers.remove(emit)
+    except Exception as exc:
+        emit(exc)
+    finally:
+        emit(_STREAM_END)
+
+
+async def astream_gigachat(prompt: str, auth_key: str | None = None, client_id: str | None = None, chat_url: str | None = None, scope: str | None = None, tenant=None):
+    """Ответ GigaChat по кускам текста по мере генерации (async for)."""
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue()
+    future = asyncio.run_coroutine_threadsafe(
+        _pump(prompt, auth_key, chat_url, scope, tenant, lambda item: loop.call_soon_threadsafe(chunks.put_nowait, item)),
+        _owner_loop(),
+    )
+    try:
+        while True:
+            item = await chunks.get()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        future.cancel()  # читатель ушёл — прекращаем генерацию
+
+
+def stream_gigachat(prompt: str, auth_key: str | None = None, client_id: str | None = None, chat_url: str | None = None, scope: str | None = None, tenant=None):
+    """Синхронный astream_gigachat — для StreamingHttpResponse портала."""
+    chunks = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(_pump(prompt, auth_key, chat_url, scope, tenant, chunks.put), _owner_loop())
+    try:
+        while True:
+            item = chunks.get()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        future.cancel()
@@ -0,0 +1,422 @@
+import os
+import json
+import mmap
+import struct
+import hashlib
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from rag import HotelIndex, BM25_K1, BM25_B, build_hotel_index
+from chunk_store import ChunkStore
+from chunker import CHUNK_SIZE, CHUNK_OVERLAP
+
+
+# Версия формата: меняется вместе с раскладкой файла или токенизатором
+FORMAT_VERSION = 2
+MAGIC = b"GGRAGIDX"
+MANIFEST_NAME = "manifest.json"
+
+# magic, версия, фрагменты, слова, записи posting-листов, позиции, байт текста, байт словаря
+_HEADER = struct.Struct("<8s7I")
+
+# Параметры, при смене которых старый индекс непригоден
+INDEX_PARAMS = {
+    "format": FORMAT_VERSION,
+    "bm25_k1": BM25_K1,
+    "bm25_b": BM25_B,
+    "chunk_size": CHUNK_SIZE,
+    "chunk_overlap": CHUNK_OVERLAP,
+}
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _atomic_write(path: str, data: bytes):
+    """Пишем во временный файл и подменяем: читатели видят либо старый, либо новый файл."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------------------
+# Запись индекса
+# ---------------------------------------------------------
+def write_index(index: HotelIndex, path: str):
+    """
+    Раскладка файла (числа — uint32/float32 в порядке байт хоста,
+    индекс — локальный кэш и на другие машины не переносится):
+    заголовок | смещения фрагментов | нормы BM25 | смещения слов |
+    смещения posting-листов | idf | номера фрагментов | tf |
+    смещения позиций | позиции | текст | словарь
+    """
+    # текст и смещения фрагментов уже лежат в нужном виде — пишем как есть
+    text = index.chunks.buffer
+    chunk_offsets = index.chunks.offsets
+
+    # словарь сортируем по байтам UTF-8 — по нему идёт бинарный поиск
+    terms = sorted((token.encode("utf-8"), token) for token, _ in index.terms())
+
+    term_offsets = array("I", [0])
+    posting_offsets = array("I", [0])
+    idf = array("f")
+    ids = array("I")
+    tfs = array("I")
+    position_offsets = array("I", [0])
+    positions = array("I")
+    vocab = bytearray()
+
+    for encoded, token in terms:
+        posting, token_idf = index.lookup(token)
+        vocab += encoded
+        term_offsets.append(len(vocab))
+        for chunk_id, tf in posting:
+            ids.append(chunk_id)
+            tfs.append(tf)
+        posting_offsets.append(len(ids))
+        idf.append(token_idf)
+        positions.extend(index.lookup_positions(token))
+        position_offsets.append(len(positions))
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(index.chunks), len(terms), len(ids), len(positions),
+                          len(text), len(vocab))
+    parts = [
+        header,
+        bytes(chunk_offsets),
+        bytes(index.norms),
+        term_offsets.tobytes(),
+        posting_offsets.tobytes(),
+        idf.tobytes(),
+        ids.tobytes(),
+        tfs.tobytes(),
+        position_offsets.tobytes(),
+        positions.tobytes(),
+        text,
+        bytes(vocab),
+    ]
+    _atomic_write(path, b"".join(parts))
+
+
+def dense_path(index_path: str) -> str:
+    return os.path.splitext(index_path)[0] + ".dense.npz"
+
+
+def write_dense(index: HotelIndex, index_path: str, dense: bool):
+    """
+    Плотный индекс пишется рядом с файлом индекса — k-means на больших корпусах
+    идёт секунды, и делать это в первом вопросе гостя или после вытеснения
+    из реестра незачем. Без dense старый файл удаляется, чтобы не пережить
+    пересборку источника.
+    """
+    path = dense_path(index_path)
+    if not dense:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return
+    from dense import DenseIndex
+    DenseIndex.from_texts(index.chunks).save(path)
+
+
+def build_file(source_path: str, index_path: str, dense: bool = False) -> int:
+    """Собирает и записывает индекс одного файла знаний (выполняется в процессе пула)."""
+    index = build_hotel_index(source_path)
+    write_index(index, index_path)
+    write_dense(index, index_path, dense)
+    return len(index.chunks)
+
+
+# ---------------------------------------------------------
+# Чтение индекса через mmap
+# ---------------------------------------------------------
+class MappedHotelIndex(HotelIndex):
+    """
+    Индекс отеля, открытый из файла только на чтение через mmap.
+    Ничего не разбирается при открытии: словарь ищется бинарным поиском
+    прямо в отображённой памяти, поэтому старт занимает миллисекунды,
+    а несколько процессов бота делят одни и те же страницы page cache.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, num_chunks, num_terms, num_postings, num_positions,
+         text_len, vocab_len) = _HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mm.close()
+            raise ValueError(f"Unsupported index file: {path}")
+
+        view = memoryview(self._mm)
+        pos = _HEADER.size
+
+        def section(count: int, fmt: str) -> memoryview:
+            nonlocal pos
+            start, pos = pos, pos + count * 4
+            return view[start:pos].cast(fmt)
+
+        chunk_offsets = section(num_chunks + 1, "I")
+        self.norms = section(num_chunks, "f")
+        self._term_offsets = section(num_terms + 1, "I")
+        self._posting_offsets = section(num_terms + 1, "I")
+        self._idf = section(num_terms, "f")
+        self._ids = section(num_postings, "I")
+        self._tfs = section(num_postings, "I")
+        self._position_offsets = section(num_terms + 1, "I")
+        self._positions = section(num_positions, "I")
+        text = view[pos:pos + text_len]
+        self._vocab = view[pos + text_len:pos + text_len + vocab_len]
+
+        self._num_terms = num_terms
+        # страницы файла общие для всех процессов, но в бюджет засчитываем целиком
+        self.nbytes = len(self._mm)
+        self.chunks = ChunkStore(text, chunk_offsets)
+        self._init_backends()
+
+    def _term(self, term_id: int) -> bytes:
+        return self._vocab[self._term_offsets[term_id]:self._term_offsets[term_id + 1]].tobytes()
+
+    def _posting(self, term_id: int):
+        start, end = self._posting_offsets[term_id], self._posting_offsets[term_id + 1]
+        return list(zip(self._ids[start:end], self._tfs[start:end]))
+
+    def _find(self, token: str) -> Optional[int]:
+        key = token.encode("utf-8")
+        lo, hi = 0, self._num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._num_terms and self._term(lo) == key:
+            return lo
+        return None
+
+    def lookup(self, token: str):
+        term_id = self._find(token)
+        if term_id is None:
+            return None
+        return self._posting(term_id), self._idf[term_id]
+
+    def contains(self, token: str) -> bool:
+        return self._find(token) is not None
+
+    def vocabulary(self):
+        offsets = self._posting_offsets
+        for term_id in range(self._num_terms):
+            yield str(self._term(term_id), "utf-8"), offsets[term_id + 1] - offsets[term_id]
+
+    def lookup_positions(self, token: str):
+        term_id = self._find(token)
+        if term_id is None:
+            return None
+        return self._positions[self._position_offsets[term_id]:self._position_offsets[term_id + 1]]
+
+    def terms(self):
+        for term_id in range(self._num_terms):
+            yield str(self._term(term_id), "utf-8"), self._posting(term_id)
+
+
+# ---------------------------------------------------------
+# Каталог индексов с манифестом
+# ---------------------------------------------------------
+class IndexStore:
+    """
+    Каталог с файлами индексов и manifest.json:
+    {"params": {...}, "files": {имя файла: {"sha256", "mtime", "size", "index"}}}.
+    Если размер и mtime источника совпали с манифестом — индекс открывается
+    без чтения источника; если mtime сменился, а хэш нет — только обновляется
+    манифест; иначе индекс этого файла пересобирается.
+    С dense=True рядом с индексом хранится и плотный индекс (режимы dense и hybrid).
+    Индексы открываются лениво из разных потоков: манифест защищён общей
+    блокировкой и сохраняется сразу после изменения, а хэширование и сборка
+    идут под блокировкой своего файла — холодная загрузка одного отеля
+    не ждёт пересборки другого.
+    """
+
+    def __init__(self, directory: str, dense: bool = False):
+        self.directory = directory
+        self.dense = dense
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = self._read_manifest()
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._file_locks: Dict[str, threading.Lock] = {}
+
+    def _read_manifest(self) -> Dict:
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+
+        if manifest.get("params") != INDEX_PARAMS:
+            # другой формат, параметры BM25 или нарезки — всё собираем заново
+            return {"params": INDEX_PARAMS, "files": {}}
+        return manifest
+
+    def open(self, filename: str, source_path: str, build: Callable[[], HotelIndex]) -> MappedHotelIndex:
+        """Открывает индекс файла знаний, пересобирая его только при изменении источника."""
+        with self._file_lock(filename):
+            stat = os.stat(source_path)
+            index_path = self._index_path(filename)
+            sha = self._stale(filename, source_path, stat)
+            if sha is not None:
+                built = build()
+                write_index(built, index_path)
+                write_dense(built, index_path, self.dense)
+                with self._lock:
+                    self._record(filename, sha, stat)
+            self.save()
+            index = MappedHotelIndex(index_path)
+            if self.dense:
+                index.set_dense(self._open_dense(index, index_path))
+            return index
+
+    def _open_dense(self, index: MappedHotelIndex, index_path: str):
+        from dense import DenseIndex
+        try:
+            return DenseIndex.load(dense_path(index_path), len(index.chunks))
+        except (OSError, ValueError, KeyError):
+            # индекс собран до включения dense или файл испорчен — собираем один раз
+            write_dense(index, index_path, True)
+            return DenseIndex.load(dense_path(index_path), len(index.chunks))
+
+    def _file_lock(self, filename: str) -> threading.Lock:
+        with self._lock:
+            return self._file_locks.setdefault(filename, threading.Lock())
+
+    def _index_path(self, filename: str) -> str:
+        return os.path.join(self.directory, f"{filename}.idx")
+
+    def _stale(self, filename: str, source_path: str, stat: os.stat_result) -> Optional[str]:
+        """
+        None, если сохранённый индекс актуален, иначе sha256 источника для пересборки.
+        Манифест читается и меняется под общей блокировкой, а файл хэшируется без неё.
+        """
+        with self._lock:
+            entry = dict(self.manifest["files"].get(filename) or {})
+        if not entry or not os.path.exists(self._index_path(filename)):
+            return file_sha256(source_path)
+        if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return None
+
+        sha = file_sha256(source_path)
+        if entry["sha256"] != sha:
+            return sha
+        with self._lock:
+            current = self.manifest["files"].get(filename)
+            if current is not None:
+                current.update(mtime=stat.st_mtime, size=stat.st_size)
+                self._dirty = True
+        return None
+
+    def _record(self, filename: str, sha: str, stat: os.stat_result):
+        self.manifest["files"][filename] = {
+            "sha256": sha,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "index": os.path.basename(self._index_path(filename)),
+        }
+        self._dirty = True
+
+    # ---------------------------------------------------------
+    # Параллельная сборка
+    # ---------------------------------------------------------
+    def build_many(
+        self,
+        sources: Dict[str, str],
+        workers: int = 0,
+        progress: Callable[[int, int, str, int], None] = None,
+    ) -> List[str]:
+        """
+        Пересобирает устаревшие индексы {имя файла: путь к источнику} в пуле
+        процессов: каждый файл нарезается и индексируется в своём процессе и
+        сразу пишется в каталог, а в манифест результаты сводятся здесь.
+        progress(готово, всего, имя файла, фрагментов) вызывается по мере
+        готовности. workers=0 — по числу ядер. Возвращает пересобранные файлы.
+        """
+        stale = {}
+        for filename, source_path in sources.items():
+            try:
+                stat = os.stat(source_path)
+                sha = self._stale(filename, source_path, stat)
+            except OSError:
+                continue  # файл удалили — prune уберёт его индекс
+            if sha is not None:
+                stale[filename] = (source_path, sha, stat)
+        self.save()
+
+        if not stale:
+            return []
+
+        workers = min(workers or os.cpu_count() or 1, len(stale))
+        built = []
+
+        def finish(filename: str, num_chunks: int):
+            source_path, sha, stat = stale[filename]
+            with self._lock:
+                self._record(filename, sha, stat)
+            built.append(filename)
+            if progress:
+                progress(len(built), len(stale), filename, num_chunks)
+
+        if workers == 1:
+            # один файл или одно ядро — пул процессов только добавит накладных расходов
+            for filename, (source_path, _, _) in stale.items():
+                try:
+                    finish(filename, build_file(source_path, self._index_path(filename), self.dense))
+                except Exception as exc:
+                    # испорченный файл одного отеля не останавливает сборку остальных
+                    print(f"❌ {filename}: не удалось проиндексировать ({exc!r})")
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(build_file, source_path, self._index_path(filename), self.dense): filename
+                    for filename, (source_path, _, _) in stale.items()
+                }
+                for future in as_completed(futures):
+                    filename = futures[future]
+                    try:
+                        finish(filename, future.result())
+                    except Exception as exc:
+                        print(f"❌ {filename}: не удалось проиндексировать ({exc!r})")
+
+        self.save()
+        return built
+
+    def prune(self, filenames):
+        """Удаляет индексы файлов, которых больше нет в knowledge/."""
+        with self._lock:
+            for filename in set(self.manifest["files"]) - set(filenames):
+                entry = self.manifest["files"].pop(filename)
+                index_path = os.path.join(self.directory, entry["index"])
+                for path in (index_path, dense_path(index_path)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self._dirty = True
+            self.save()
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self.manifest, ensure_ascii=False, indent=2).encode("utf-8")
+            _atomic_write(os.path.join(self.directory, MANIFEST_NAME), data)
+            self._dirty = False
@@ -0,0 +1,80 @@
+# bot/llm_cache.py
+"""
+Кэш ответов GigaChat: одинаковый промпт (вопрос + те же блоки контекста) той же
+площадки получает сохранённый ответ вместо нового обращения к LLM.
+
+Ключ — площадка, модель и sha256 нормализованного промпта: ответы разных отелей
+не смешиваются, а изменившийся контекст (профиль, брони, фрагменты знаний)
+даёт другой ключ сам собой.
+
+Бот держит ResponseCache в памяти процесса; портал кладёт ответы в кэш Django
+(settings.CACHES["llm"]) по тому же cache_key(). Только стандартная библиотека.
+"""
+import os
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+
+# Сколько секунд живёт ответ и сколько ответов держим (0 — кэш выключен)
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Юникод в NFC, пробелы схлопнуты: переносы и отступы ответа не меняют."""
+    return " ".join(unicodedata.normalize("NFC", prompt).split())
+
+
+def cache_key(tenant, model: str, prompt: str) -> str:
+    digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    return f"llm:{tenant}:{model}:{digest}"
+
+
+class ResponseCache:
+    """
+    LRU с TTL в памяти процесса. Потокобезопасен: бот обращается к нему из event
+    loop, а asyncio.to_thread-задачи — из своих потоков.
+    """
+
+    def __init__(self, maxsize: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] <= time.monotonic():
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: str):
+        if self.maxsize <= 0 or self.ttl <= 0 or not value:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
@@ -1,70 +1,44 @@
 # bot/load_knowledge.py
-import os
-from rag import SmartHotelRAG
+"""
+Сборка индексов всех отелей из knowledge/ заранее — например, на деплое
+или после массового добавления отелей:
 
+    python load_knowledge.py              # процессов по числу ядер
+    python load_knowledge.py --workers 4
 
-def split_into_chunks(text: str, max_len: int = 700) -> list[str]:
-    """
-    Простой разрез текста на чанки, чтобы RAG работал точнее.
-    Рубим по абзацам и потом по длине.
-    """
-    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
-    chunks: list[str] = []
+Пересобираются только изменившиеся файлы (по манифесту), каждый — в своём
+процессе. Бот при старте делает то же самое (RAG_BUILD_WORKERS).
+"""
+import sys
+import time
+import argparse
 
-    for p in paragraphs:
-        if len(p) <= max_len:
-            chunks.append(p)
-        else:
-            # слишком длинный абзац — режем по max_len символов
-            start = 0
-            while start < len(p):
-                part = p[start:start + max_len]
-                chunks.append(part.strip())
-                start += max_len
+import rag
+from rag import SmartHotelRAG, KNOWLEDGE_DIR
 
-    return chunks
 
+def load_files(workers: int = 0) -> int:
+    if not rag.INDEX_DIR:
+        print("❌ RAG_INDEX_DIR пуст — индексы строятся в памяти бота, собирать заранее некуда")
+        return 1
 
-def load_files():
-    rag = SmartHotelRAG()
-    knowledge_dir = "knowledge"
+    started = time.perf_counter()
+    # конструктор находит файлы и собирает устаревшие индексы в пуле процессов
+    knowledge = SmartHotelRAG(build_workers=workers)
+    if not knowledge.registry:
+        print(f"Нет .txt/.json файлов в папке {KNOWLEDGE_DIR}/")
+        return 1
 
-    if not os.path.isdir(knowledge_dir):
-        print(f"Папка {knowledge_dir} не найдена")
-        return
+    print(f"🧮 Отелей: {len(knowledge.registry)}, время: {time.perf_counter() - started:.1f} с")
+    return 0
 
-    files = [f for f in os.listdir(knowledge_dir) if f.endswith(".txt")]
-    if not files:
-        print("Нет .txt файлов в папке knowledge/")
-        return
 
-    total_chunks = 0
-
-    for filename in files:
-        path = os.path.join(knowledge_dir, filename)
-
-        # hotel_id берём из имени файла: EcoHouse.txt → EcoHouse
-        hotel_id = os.path.splitext(filename)[0]
-
-        with open(path, "r", encoding="utf-8") as f:
-            text = f.read().strip()
-
-        chunks = split_into_chunks(text)
-        print(f"{filename}: разрезали на {len(chunks)} чанков")
-
-        ids = [f"{hotel_id}_{i}" for i in range(len(chunks))]
-
-        rag.collection.upsert(
-            ids=ids,
-            documents=chunks,
-            metadatas=[{"hotel": hotel_id} for _ in chunks],
-        )
-
-        total_chunks += len(chunks)
-        print(f"✅ Загружено {len(chunks)} чанков для отеля {hotel_id}")
-
-    print(f"🧮 Всего фрагментов во всех отелях: {total_chunks}")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сборка индексов знаний отелей")
+    parser.add_argument("--workers", type=int, default=0, help="число процессов (0 — по числу ядер)")
+    args = parser.parse_args(argv)
+    return load_files(args.workers)
 
 
 if __name__ == "__main__":
-    load_files()
+    sys.exit(main())
@@ -1,10 +1,386 @@
 import os
-import json
-from typing import List, Dict
+import math
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import List, Dict, Tuple, Optional, Sequence
+
+from tokenizer import tokenize
+from chunker import chunk_file
+from chunk_store import ChunkStore
+from registry import TenantRegistry, slugify
+from query_cache import QueryCache
+from context_packer import pack_context
+from faq import FaqIndex, load_entries
 
 
 KNOWLEDGE_DIR = "knowledge"
 
+# Каталог с сохранёнными mmap-индексами; пустое значение — строить в памяти на каждом старте
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", os.path.join(KNOWLEDGE_DIR, ".index"))
+
+# Сколько памяти (МБ) могут занимать загруженные индексы отелей, дальше — LRU-вытеснение
+MEMORY_BUDGET_MB = int(os.getenv("RAG_MEMORY_BUDGET_MB", "512"))
+
+# Сколько процессов собирают устаревшие индексы при старте (0 — по числу ядер)
+BUILD_WORKERS = int(os.getenv("RAG_BUILD_WORKERS", "0"))
+
+# Кэш результатов поиска: сколько записей и сколько секунд жить (0 записей — выключен)
+QUERY_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "4096"))
+QUERY_CACHE_TTL = float(os.getenv("RAG_CACHE_TTL", "600"))
+
+# Режимы ранжирования: "match" — число совпавших слов, "bm25" — Okapi BM25,
+# "tfidf" — косинус по разреженной TF-IDF матрице, "dense" — ANN по хэшированным
+# эмбеддингам, "hybrid" — слияние bm25 и dense (последним трём нужны numpy и scipy)
+RANKING_MODES = ("match", "bm25", "tfidf", "dense", "hybrid")
+# Режимы, которым нужен плотный индекс: он собирается вместе с индексом отеля
+DENSE_RANKINGS = ("dense", "hybrid")
+DEFAULT_RANKING = os.getenv("RAG_RANKING", "bm25")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Близость слов (BM25TP): пары соседних слов вопроса дальше окна не считаются,
+# бонус пересчитывается для PROXIMITY_DEPTH × top_k лучших по BM25 фрагментов
+PROXIMITY_WINDOW = 5
+PROXIMITY_DEPTH = 10
+
+# Гибридный режим: глубина списков-кандидатов (× top_k) и константа RRF
+HYBRID_DEPTH = 10
+RRF_K = 60
+
+
+class HotelIndex:
+    """
+    Инвертированный индекс фрагментов одного отеля.
+    Фрагменты нормализуются (tokenizer.tokenize) один раз —
+    при загрузке, а поиск трогает только posting-листы слов из вопроса.
+    Статистика для BM25 (df, средняя длина, нормы) тоже считается здесь.
+    Позиции слов хранятся отдельно от posting-листов — по ним считается
+    бонус за фразу и близость слов вопроса.
+    """
+
+    # реестр подписывается, чтобы пересчитать бюджет, когда лениво строится бэкенд
+    on_resize = None
+
+    def __init__(self, chunks: List[str]):
+        # текст фрагментов — один UTF-8 буфер со смещениями, а не список строк
+        self.chunks = ChunkStore.from_texts(chunks)
+        # {слово: [(номер фрагмента, сколько раз слово в нём встречается)]}
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        # {слово: позиции во всех фрагментах подряд, в порядке posting-листа}:
+        # позиции записи — следующие tf чисел, поэтому отдельные смещения не нужны
+        self.positions: Dict[str, array] = {}
+        lengths = array("I")
+
+        for chunk_id, text in enumerate(chunks):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            # позиция — номер слова после удаления стоп-слов: «выезд в 14:00» — соседи
+            places: Dict[str, List[int]] = {}
+            for position, token in enumerate(tokens):
+                places.setdefault(token, []).append(position)
+            for token, where in places.items():
+                self.postings.setdefault(token, []).append((chunk_id, len(where)))
+                self.positions.setdefault(token, array("I")).extend(where)
+
+        self._prepare_bm25(lengths)
+        self._init_backends()
+        self.nbytes = self._estimate_nbytes()
+
+    def _init_backends(self):
+        # бэкенды строятся лениво; первые запросы могут прийти из нескольких потоков сразу
+        self._tfidf = None
+        self._dense = None
+        self._speller = None
+        self._backend_lock = threading.Lock()
+
+    def _estimate_nbytes(self) -> int:
+        """Приблизительный объём памяти индекса — для бюджета TenantRegistry."""
+        entries = sum(len(posting) for posting in self.postings.values())
+        return (
+            self.chunks.nbytes
+            + 72 * entries               # кортеж (id, tf) + слот списка
+            + 160 * len(self.postings)   # ключ, список, запись словаря и idf
+            + sum(64 + 4 * len(places) for places in self.positions.values())
+            + self.norms.itemsize * len(self.norms)
+        )
+
+    def _prepare_bm25(self, lengths: array):
+        total = len(lengths)
+        avg_len = (sum(lengths) / total) if total else 0.0
+
+        self.idf: Dict[str, float] = {
+            token: math.log(1 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+            for token, posting in self.postings.items()
+        }
+        # знаменатель BM25 без tf: k1 * (1 - b + b * len / avg_len);
+        # float32, как и в файле индекса, — ранжирование в памяти и из mmap совпадает
+        self.norms = array("f", (
+            BM25_K1 * (1 - BM25_B + BM25_B * (length / avg_len if avg_len else 0.0))
+            for length in lengths
+        ))
+
+    # ---------------------------------------------------------
+    # Доступ к данным индекса (MappedHotelIndex читает их из файла)
+    # ---------------------------------------------------------
+    def lookup(self, token: str):
+        """(posting-лист, idf) слова или None, если слова нет в индексе."""
+        posting = self.postings.get(token)
+        if not posting:
+            return None
+        return posting, self.idf[token]
+
+    def contains(self, token: str) -> bool:
+        return token in self.postings
+
+    def vocabulary(self):
+        """Все слова индекса с числом фрагментов, где они встречаются."""
+        return ((token, len(posting)) for token, posting in self.postings.items())
+
+    def lookup_positions(self, token: str):
+        """Позиции слова подряд по записям его posting-листа (по tf на запись)."""
+        return self.positions.get(token)
+
+    def terms(self):
+        """Все слова индекса с их posting-листами."""
+        return self.postings.items()
+
+    def tfidf(self):
+        """TF-IDF матрица строится лениво — numpy/scipy нужны только этому режиму."""
+        if self._tfidf is None:
+            with self._backend_lock:
+                if self._tfidf is None:
+                    from tfidf import TfidfMatrix
+                    tfidf = TfidfMatrix(self.terms(), len(self.chunks))
+                    self._grow(tfidf)
+                    self._tfidf = tfidf
+        return self._tfidf
+
+    def dense(self):
+        """Плотный ANN-индекс (хэшированные эмбеддинги), тоже строится лениво."""
+        if self._dense is None:
+            with self._backend_lock:
+                if self._dense is None:
+                    from dense import DenseIndex
+                    dense = DenseIndex.from_texts(self.chunks)
+                    self._grow(dense)
+                    self._dense = dense
+        return self._dense
+
+    def set_dense(self, dense):
+        """Плотный индекс, собранный вместе с индексом отеля или прочитанный с диска."""
+        with self._backend_lock:
+            if self._dense is None:
+                self._grow(dense)
+                self._dense = dense
+
+    def speller(self):
+        """Словарь для исправления опечаток — строится лениво, при первом незнакомом слове."""
+        if self._speller is None:
+            with self._backend_lock:
+                if self._speller is None:
+                    from spelling import SpellIndex
+                    speller = SpellIndex(self.vocabulary())
+                    self._grow(speller)
+                    self._speller = speller
+        return self._speller
+
+    def _grow(self, backend):
+        """
+        Построенный бэкенд засчитывается в nbytes, реестр узнаёт новый размер.
+        Вызывается под _backend_lock, поэтому каждый бэкенд учитывается один раз.
+        """
+        self.nbytes += backend.nbytes
+        if self.on_resize is not None:
+            self.on_resize(self)
+
+    def query_terms(self, question: str) -> Counter:
+        """
+        Слова вопроса с весами. Слово, которого нет в индексе («паркова»,
+        «завтрк»), заменяется ближайшим словом словаря отеля, если такое есть.
+        """
+        terms = Counter()
+        for token, weight in Counter(tokenize(question)).items():
+            if not self.contains(token):
+                token = self.speller().correct(token) or token
+            terms[token] += weight
+        return terms
+
+    def search_many(self, questions: List[str], top_k: int = 3) -> List[List[str]]:
+        best = self.tfidf().search_many(questions, top_k=top_k)
+        return [[self.chunks[chunk_id] for chunk_id in ids] for ids in best]
+
+    def search(self, question: str, top_k: int = 3, ranking: str = "match") -> List[str]:
+        if ranking not in RANKING_MODES:
+            raise ValueError(f"Unknown ranking mode: {ranking}")
+        return [self.chunks[chunk_id] for chunk_id in self.rank(question, top_k, ranking)]
+
+    def context(self, question: str, top_k: int = 3, ranking: str = "match") -> str:
+        """
+        То же, что "\n".join(search(...)), но фрагменты склеиваются прямо
+        из буфера memoryview-срезами и декодируются одной строкой.
+        """
+        if ranking not in RANKING_MODES:
+            raise ValueError(f"Unknown ranking mode: {ranking}")
+        return self.chunks.join(self.rank(question, top_k, ranking))
+
+    def rank(self, question: str, top_k: int = 3, ranking: str = "match") -> List[int]:
+        """Номера лучших фрагментов по убыванию релевантности."""
+        if ranking == "tfidf":
+            return self.tfidf().search_many([question], top_k=top_k)[0]
+        if ranking == "dense":
+            return [chunk_id for chunk_id, _ in self.dense().search(question, top_k)]
+        if ranking == "hybrid":
+            return self._rank_hybrid(question, top_k)
+        if ranking == "bm25":
+            return self._rank_bm25(question, top_k)
+
+        scores: Dict[int, float] = {}
+        # слово, повторённое в вопросе, весит столько раз, сколько повторено
+        for token, weight in self.query_terms(question).items():
+            entry = self.lookup(token)
+            if entry is None:
+                continue
+            for chunk_id, _ in entry[0]:
+                scores[chunk_id] = scores.get(chunk_id, 0) + weight
+
+        # при равном счёте выше тот фрагмент, что раньше в файле
+        best = heapq.nsmallest(top_k, scores.items(), key=lambda x: (-x[1], x[0]))
+        return [chunk_id for chunk_id, _ in best]
+
+    def _rank_bm25(self, question: str, top_k: int, proximity: bool = True) -> List[int]:
+        entries, weights = {}, {}
+        for token, weight in self.query_terms(question).items():
+            entry = self.lookup(token)
+            if entry is not None:
+                entries[token] = entry
+                weights[token] = weight
+
+        proximity = proximity and len(entries) > 1
+        # бонус за близость считаем только для верхушки BM25 — это дорого
+        depth = max(top_k * PROXIMITY_DEPTH, top_k) if proximity else top_k
+        scores = self._bm25_scores(entries, weights, depth)
+        if proximity:
+            top = heapq.nsmallest(depth, scores.items(), key=lambda x: (-x[1], x[0]))
+            scores = dict(top)
+            for chunk_id, boost in self._proximity(entries, scores).items():
+                scores[chunk_id] += boost
+
+        # при равном счёте выше тот фрагмент, что раньше в файле
+        best = heapq.nsmallest(top_k, scores.items(), key=lambda x: (-x[1], x[0]))
+        return [chunk_id for chunk_id, _ in best]
+
+    def _bm25_scores(self, entries: Dict[str, Tuple], weights: Dict[str, int], depth: int) -> Dict[int, float]:
+        """
+        Счёт BM25 с отсечением MaxScore. Слова идут от самого весомого к самому
+        частому; вклад слова не больше idf × (k1 + 1). Когда сумма таких границ
+        у оставшихся слов меньше счёта depth-го кандидата, новый фрагмент в
+        верхушку уже не попадёт: частые слова только досчитывают имеющихся
+        кандидатов, а кандидаты, которым порог не догнать, выбрасываются.
+        Верхние depth фрагментов и их счёт — те же, что при полном подсчёте.
+        """
+        order = sorted(entries, key=lambda token: -entries[token][1] * weights[token])
+        bounds = [entries[token][1] * weights[token] * (BM25_K1 + 1) for token in order]
+        remaining = sum(bounds)
+        norms = self.norms
+        scores: Dict[int, float] = {}
+
+        for token, bound in zip(order, bounds):
+            posting, idf = entries[token]
+            idf *= weights[token] * (BM25_K1 + 1)
+            threshold = heapq.nlargest(depth, scores.values())[-1] if len(scores) >= depth else 0.0
+
+            if remaining < threshold:
+                scores = {chunk_id: score for chunk_id, score in scores.items() if score + remaining >= threshold}
+                if len(scores) * 16 < len(posting):
+                    # кандидатов мало — ищем их в posting-листе (он упорядочен по номеру фрагмента)
+                    for chunk_id in scores:
+                        i = bisect_left(posting, (chunk_id,))
+                        if i < len(posting) and posting[i][0] == chunk_id:
+                            tf = posting[i][1]
+                            scores[chunk_id] += idf * tf / (tf + norms[chunk_id])
+                else:
+                    for chunk_id, tf in posting:
+                        if chunk_id in scores:
+                            scores[chunk_id] += idf * tf / (tf + norms[chunk_id])
+            else:
+                for chunk_id, tf in posting:
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf / (tf + norms[chunk_id])
+            remaining -= bound
+        return scores
+
+    def proximity_scores(self, question: str, chunk_ids) -> Dict[int, float]:
+        """Бонус за близость слов вопроса для указанных фрагментов (для оценки и отладки)."""
+        entries = {}
+        for token in self.query_terms(question):
+            entry = self.lookup(token)
+            if entry is not None:
+                entries[token] = entry
+        return self._proximity(entries, set(chunk_ids))
+
+    def _proximity(self, entries: Dict[str, Tuple], chunk_ids) -> Dict[int, float]:
+        """
+        Бонус BM25TP: для каждой пары соседних в вопросе слов суммируется
+        1/d² по парам их вхождений на расстоянии d ≤ PROXIMITY_WINDOW
+        (в обратном порядке — на шаг дальше) и насыщается, как tf в BM25.
+        Слова, стоящие в фрагменте рядом и по порядку («поздний выезд»),
+        дают наибольший бонус. entries — {слово: (posting, idf)} в порядке вопроса.
+        """
+        places: Dict[str, Dict[int, Sequence[int]]] = {}
+        for token, (posting, _) in entries.items():
+            positions = self.lookup_positions(token)
+            found = places[token] = {}
+            offset = 0
+            for chunk_id, tf in posting:
+                if chunk_id in chunk_ids:
+                    found[chunk_id] = positions[offset:offset + tf]
+                offset += tf
+
+        boosts: Dict[int, float] = {}
+        tokens = list(entries)
+        for first, second in zip(tokens, tokens[1:]):
+            weight = min(entries[first][1], entries[second][1])
+            right_places = places[second]
+            for chunk_id, left in places[first].items():
+                right = right_places.get(chunk_id)
+                if right is None:
+                    continue
+                acc = 0.0
+                for a in left:
+                    for b in right:
+                        distance = b - a if b > a else a - b + 1
+                        if distance <= PROXIMITY_WINDOW:
+                            acc += 1.0 / (distance * distance)
+                if acc:
+                    norm = self.norms[chunk_id]
+                    boosts[chunk_id] = boosts.get(chunk_id, 0.0) + weight * acc * (BM25_K1 + 1) / (acc + norm)
+        return boosts
+
+    def _rank_hybrid(self, question: str, top_k: int) -> List[int]:
+        """
+        Слияние BM25 и плотного поиска по Reciprocal Rank Fusion:
+        счёт фрагмента — сумма 1 / (RRF_K + место) по обоим спискам.
+        BM25-список считается без бонуса за близость: тот сканирует posting-листы
+        целиком и стоил бы больше самого отсечённого BM25, а порядок внутри
+        списка RRF всё равно сглаживает.
+        """
+        depth = max(top_k * HYBRID_DEPTH, top_k)
+        fused: Dict[int, float] = {}
+        for ranked in (self._rank_bm25(question, depth, proximity=False), self.rank(question, depth, "dense")):
+            for place, chunk_id in enumerate(ranked):
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + place + 1)
+
+        best = heapq.nsmallest(top_k, fused.items(), key=lambda x: (-x[1], x[0]))
+        return [chunk_id for chunk_id, _ in best]
+
+
+def build_hotel_index(path: str) -> HotelIndex:
+    """Нарезает файл знаний и строит его индекс в памяти."""
+    return HotelIndex([chunk.text for chunk in chunk_file(path)])
+
 
 class SmartHotelRAG:
     """
@@ -12,8 +388,23 @@ class SmartHotelRAG:
     Загружает знания из файлов и делает простой поиск по тексту.
     """
 
-    def __init__(self):
-        self.knowledge = {}  # {hotel_name: [chunks]}
+    def __init__(
+        self,
+        ranking: str = DEFAULT_RANKING,
+        memory_budget_mb: int = MEMORY_BUDGET_MB,
+        build_workers: int = BUILD_WORKERS,
+    ):
+        if ranking not in RANKING_MODES:
+            raise ValueError(f"Unknown ranking mode: {ranking}")
+        self.ranking = ranking
+        self.build_workers = build_workers
+        # {slug отеля: файл знаний}; индексы грузятся лениво при первом запросе
+        self.registry = TenantRegistry(self._load_file, memory_budget_mb * 1024 * 1024)
+        self.cache = QueryCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+        self._sources: Dict[str, Tuple[float, int]] = {}  # {имя файла: (mtime, размер)}
+        self._store = None
+        self._lock = threading.Lock()
+        self._faq: Dict[str, Tuple[int, FaqIndex]] = {}  # {slug: (версия отеля, FAQ)}
         self.load_all()
 
     # ---------------------------------------------------------
@@ -24,86 +415,186 @@ class SmartHotelRAG:
             print("❌ Папка knowledge/ не найдена")
             return
 
-        for filename in os.listdir(KNOWLEDGE_DIR):
-            if not filename.endswith(".txt") and not filename.endswith(".json"):
-                continue
+        self._store = self._open_store()
+        self.refresh()
+        print(f"📚 Найдено отелей в {KNOWLEDGE_DIR}/: {len(self.registry)}")
+        self.build_all()
 
-            hotel = filename.replace(".txt", "").replace(".json", "")
+    def build_all(self, workers: int = None, progress=None) -> List[str]:
+        """
+        Заранее собирает устаревшие индексы всех файлов параллельно, по процессу
+        на файл, чтобы первый вопрос к отелю не ждал индексации. Сами индексы
+        открываются лениво, как и раньше. Без каталога индексов собирать
+        заранее некуда — тогда всё остаётся ленивым.
+        """
+        if self._store is None:
+            return []
 
-            filepath = os.path.join(KNOWLEDGE_DIR, filename)
-            text = self._read_file(filepath)
+        def report(done: int, total: int, filename: str, num_chunks: int):
+            print(f"📚 [{done}/{total}] {self._hotel_name(filename)}: проиндексировано {num_chunks} фрагментов")
 
-            chunks = self._split_chunks(text)
-            self.knowledge[hotel] = chunks
+        sources = {f: os.path.join(KNOWLEDGE_DIR, f) for f in self._sources}
+        workers = self.build_workers if workers is None else workers
+        built = self._store.build_many(sources, workers=workers, progress=progress or report)
+        if built:
+            print(f"✅ Собрано индексов: {len(built)}")
+        return built
 
-            print(f"📚 {hotel}: загружено {len(chunks)} фрагментов")
+    @staticmethod
+    def _hotel_name(filename: str) -> str:
+        return filename.replace(".txt", "").replace(".json", "")
 
-    # ---------------------------------------------------------
-    def _read_file(self, path: str) -> str:
-        if path.endswith(".json"):
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        sources = {}
+        for filename in sorted(os.listdir(KNOWLEDGE_DIR)):
+            if not filename.endswith(".txt") and not filename.endswith(".json"):
+                continue
             try:
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                return data.get("text", "")
-            except:
-                return ""
+                stat = os.stat(os.path.join(KNOWLEDGE_DIR, filename))
+            except OSError:
+                continue  # файл удалили между listdir и stat
+            sources[filename] = (stat.st_mtime, stat.st_size)
+        return sources
+
+    def _load_file(self, filename: str) -> HotelIndex:
+        filepath = os.path.join(KNOWLEDGE_DIR, filename)
+
+        def build() -> HotelIndex:
+            return build_hotel_index(filepath)
+
+        if self._store is not None:
+            index = self._store.open(filename, filepath, build)
         else:
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    return f.read()
-            except:
-                return ""
+            index = build()
+            if self.ranking in DENSE_RANKINGS:
+                index.dense()  # вместе с индексом, а не в первом вопросе; в бюджет — сразу
+        print(f"📚 {self._hotel_name(filename)}: загружено {len(index.chunks)} фрагментов")
+        return index
 
     # ---------------------------------------------------------
-    # Разбиение на блоки (чтобы ГигаЧату было проще)
+    # Горячая перезагрузка: только изменённые, новые и удалённые файлы
     # ---------------------------------------------------------
-    def _split_chunks(self, text: str, min_len: int = 40) -> List[str]:
-        lines = text.split("\n")
-        chunks = [l.strip() for l in lines if len(l.strip()) >= min_len]
-        return chunks
+    def refresh(self, hotel=None) -> List[str]:
+        """
+        Обновляет каталог отелей по файлам knowledge/, изменившимся с прошлого
+        вызова, и возвращает их имена. Загруженные индексы изменённых отелей
+        пересобираются и подменяются в реестре целиком, так что query()
+        никогда не видит наполовину собранный индекс; незагруженные
+        подхватятся лениво при первом запросе.
+        hotel — дополнительно пересобрать этот отель, даже если его файл не менялся.
+        """
+        with self._lock:
+            if not os.path.exists(KNOWLEDGE_DIR):
+                return []
+
+            current = self._scan()
+            changed = [f for f, sig in current.items() if self._sources.get(f) != sig]
+            removed = [f for f in self._sources if f not in current]
+            slugs = {slugify(f) for f in changed + removed}
+            if changed or removed:
+                # при .txt и .json одного отеля побеждает последний по алфавиту, как и раньше
+                self.registry.set_sources({slugify(f): f for f in current})
+            if hotel and hotel in self.registry and slugify(hotel) not in slugs:
+                slugs.add(slugify(hotel))
+                changed.append(self.registry.source(hotel))
+            if not slugs:
+                return []
+
+            for slug in slugs:
+                try:
+                    self.registry.reload(slug)
+                except Exception as exc:
+                    # остальные отели обновляются, а этот остаётся со старым индексом
+                    print(f"❌ {slug}: не удалось проиндексировать ({exc!r})")
+
+            if self._store is not None:
+                self._store.prune(current)
+
+            self._sources = current
+            return sorted(set(changed) | set(removed))
+
+    def _open_store(self):
+        if not INDEX_DIR:
+            return None
+        from index_store import IndexStore
+        try:
+            return IndexStore(INDEX_DIR, dense=self.ranking in DENSE_RANKINGS)
+        except OSError as exc:
+            print(f"⚠️ Каталог индекса {INDEX_DIR} недоступен ({exc}), строим индекс в памяти")
+            return None
 
     # ---------------------------------------------------------
     # Основной метод поиска
     # ---------------------------------------------------------
-    def query(self, question: str, hotel: str = None, top_k: int = 3) -> str:
+    def _resolve_hotel(self, hotel) -> Optional[HotelIndex]:
+        """Индекс отеля по имени или id без учёта регистра (O(1) по slug)."""
+        return self.registry.get(hotel)
 
-        if not hotel:
+    def query(self, question: str, hotel=None, top_k: int = 3, ranking: str = None, budget: int = None) -> str:
+        """
+        Контекст по вопросу: top_k лучших фрагментов через перевод строки.
+        С budget фрагменты проходят через pack_context — почти одинаковые
+        строки выбрасываются, а контекст укладывается в budget токенов.
+        """
+        if not hotel or hotel not in self.registry:
             return ""
 
-        hotel = hotel.lower()
+        ranking = ranking or self.ranking
+        # версию берём до поиска: при переиндексации ключ просто устареет
+        key = (slugify(hotel), self.registry.version(hotel), " ".join(tokenize(question)), top_k, ranking, budget)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
 
-        if hotel not in (h.lower() for h in self.knowledge.keys()):
+        index = self._resolve_hotel(hotel)
+        if index is None:
             return ""
 
-        # Находим реальный ключ (чтобы не было ошибки регистра)
-        for h in self.knowledge:
-            if h.lower() == hotel:
-                hotel = h
-                break
-
-        chunks = self.knowledge.get(hotel, [])
+        if budget is None:
+            result = index.context(question, top_k=top_k, ranking=ranking)
+        else:
+            result = pack_context(index.search(question, top_k=top_k, ranking=ranking), budget=budget)
+        self.cache.put(key, result)
+        return result
 
-        # простой поиск по ключевым словам
-        q = question.lower()
-        scored: List[Dict] = []
+    # ---------------------------------------------------------
+    # FAQ: готовые ответы без LLM
+    # ---------------------------------------------------------
+    def answer(self, question: str, hotel=None) -> Optional[str]:
+        """Ответ из FAQ отеля (поле "faq" его JSON-файла), если вопрос узнан уверенно."""
+        faq = self._resolve_faq(hotel) if hotel else None
+        return faq.match(question) if faq else None
 
-        for ch in chunks:
-            score = 0
-            for word in q.split():
-                if word in ch.lower():
-                    score += 1
-            if score > 0:
-                scored.append({"score": score, "text": ch})
+    def _resolve_faq(self, hotel) -> Optional[FaqIndex]:
+        filename = self.registry.source(hotel)
+        if not filename or not filename.endswith(".json"):
+            return None
+        slug, version = slugify(hotel), self.registry.version(hotel)
+        cached = self._faq.get(slug)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        # версия растёт при каждой переиндексации файла — тогда и FAQ перечитывается
+        faq = FaqIndex(load_entries(os.path.join(KNOWLEDGE_DIR, filename)))
+        self._faq[slug] = (version, faq)
+        return faq
 
-        if not scored:
-            return ""
+    def stats(self) -> Dict[str, Dict]:
+        """Счётчики реестра отелей и кэша запросов — для мониторинга."""
+        return {"registry": self.registry.stats(), "cache": self.cache.stats()}
 
-        # сортировка по релевантности
-        scored = sorted(scored, key=lambda x: x["score"], reverse=True)
+    # ---------------------------------------------------------
+    # Пакетный поиск (оффлайн-оценка, предрасчёт ответов на FAQ)
+    # ---------------------------------------------------------
+    def query_many(self, questions: List[str], hotel, top_k: int = 3) -> List[str]:
+        """
+        Контекст для каждого вопроса пачки — в том же виде, что и query().
+        Вся пачка оценивается одним произведением TF-IDF матриц.
+        """
+        index = self._resolve_hotel(hotel)
+        if index is None:
+            return ["" for _ in questions]
 
-        # берём лучшие k
-        best = [s["text"] for s in scored[:top_k]]
-        return "\n".join(best)
+        return [index.chunks.join(ids) for ids in index.tfidf().search_many(questions, top_k=top_k)]
 
 
 # ---------------------------------------
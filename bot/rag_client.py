@@ -0,0 +1,137 @@
+# bot/rag_client.py
+"""
+Клиент сервиса поиска (rag_service.py) с тем же query(), что у SmartHotelRAG.
+Только стандартная библиотека — портал импортирует его как bot.rag_client,
+не подтягивая numpy и прочие зависимости бота.
+
+    rag = RagClient("http://127.0.0.1:8765")      # или "unix:///tmp/rag.sock"
+    context = rag.query("есть ли парковка?", hotel="EcoHouse")
+"""
+import json
+import socket
+import logging
+import threading
+import http.client
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+
+DEFAULT_TIMEOUT = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+class RagServiceError(Exception):
+    pass
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+class _TCPHTTPConnection(http.client.HTTPConnection):
+    def connect(self):
+        super().connect()
+        # короткие запросы: не ждём подтверждения предыдущего пакета (Nagle)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class RagClient:
+    """
+    Потокобезопасный клиент: у каждого потока своё keep-alive соединение.
+    query() при недоступном сервисе возвращает пустой контекст — как
+    SmartHotelRAG для неизвестного отеля, — чтобы ответ гостю не падал.
+    """
+
+    def __init__(self, url: str, timeout: float = DEFAULT_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        parts = urlsplit(url)
+        if parts.scheme == "unix":
+            self._socket_path = parts.path
+        elif parts.scheme == "http":
+            self._socket_path = None
+            self._host, self._port = parts.hostname, parts.port or 80
+        else:
+            raise ValueError(f"Unsupported RAG service URL: {url}")
+        self._local = threading.local()
+
+    # ---------------------------------------------------------
+    # Интерфейс SmartHotelRAG
+    # ---------------------------------------------------------
+    def query(self, question: str, hotel=None, top_k: int = 3, ranking: str = None, budget: int = None) -> str:
+        if not hotel:
+            return ""
+        try:
+            return self.query_many([
+                {"question": question, "hotel": hotel, "top_k": top_k, "ranking": ranking, "budget": budget},
+            ])[0]
+        except RagServiceError as exc:
+            logger.warning(f"RAG service unavailable: {exc}")
+            return ""
+
+    def answer(self, question: str, hotel=None) -> Optional[str]:
+        if not hotel:
+            return None
+        try:
+            return self._request("POST", "/answer", {"question": question, "hotel": hotel})["answer"]
+        except RagServiceError as exc:
+            logger.warning(f"RAG service unavailable: {exc}")
+            return None
+
+    def query_many(self, queries: List[Dict]) -> List[str]:
+        """Пачка запросов одним обращением: [{"question", "hotel", "top_k", "ranking", "budget"}]."""
+        return self._request("POST", "/query", {"queries": queries})["results"]
+
+    def health(self) -> Dict:
+        return self._request("GET", "/health")
+
+    def reload(self, hotel: Optional[str] = None) -> List[str]:
+        return self._request("POST", "/reload", {"hotel": hotel} if hotel else {})["changed"]
+
+    # ---------------------------------------------------------
+    # HTTP
+    # ---------------------------------------------------------
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self._socket_path:
+                conn = _UnixHTTPConnection(self._socket_path, self.timeout)
+            else:
+                conn = _TCPHTTPConnection(self._host, self._port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method: str, path: str, payload: Dict = None) -> Dict:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+
+        # вторая попытка — на случай, если сервис закрыл простаивавшее соединение;
+        # таймаут не повторяем: гость ждал бы ответа вдвое дольше настроенного
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                self._local.conn = None
+                if attempt or not isinstance(exc, (ConnectionError, http.client.BadStatusLine)):
+                    raise RagServiceError(str(exc) or type(exc).__name__) from exc
+                continue
+
+            try:
+                result = json.loads(data)
+            except ValueError as exc:
+                raise RagServiceError(f"bad response from {path}") from exc
+            if response.status != 200:
+                raise RagServiceError(f"{path}: HTTP {response.status} {result.get('error', '')}")
+            return result
@@ -0,0 +1,182 @@
+# bot/rag_service.py
+"""
+Поиск по знаниям отелей отдельным процессом: один прогретый SmartHotelRAG
+на хост вместо копии индекса в каждом процессе бота и воркере gunicorn.
+
+    python rag_service.py                          # http://127.0.0.1:8765
+    RAG_SERVICE_SOCKET=/tmp/rag.sock python rag_service.py
+
+POST /query   {"queries": [{"question", "hotel", "top_k", "ranking", "budget"}, ...]}
+              → {"results": [контекст, ...]}
+GET  /health  → {"status": "ok", "hotels": N, "registry": {...}, "cache": {...}}
+POST /answer  {"question", "hotel"} → {"answer": готовый ответ из FAQ или null}
+POST /reload  {} — перечитать изменённые файлы, {"hotel": "EcoHouse"} — пересобрать один отель
+              → {"changed": [...]}
+
+Клиент — rag_client.RagClient (только стандартная библиотека).
+"""
+import os
+import json
+import logging
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rag import SmartHotelRAG
+from watcher import KnowledgeWatcher
+
+
+HOST = os.getenv("RAG_SERVICE_HOST", "127.0.0.1")
+PORT = int(os.getenv("RAG_SERVICE_PORT", "8765"))
+# Путь к Unix-сокету; если задан — слушаем его вместо TCP
+SOCKET_PATH = os.getenv("RAG_SERVICE_SOCKET", "")
+RAG_RELOAD_INTERVAL = float(os.getenv("RAG_RELOAD_INTERVAL", "30"))
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH = 256
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)  # сокет от упавшего процесса
+        super().server_bind()
+        os.chmod(self.server_address, 0o660)
+
+
+class RagRequestHandler(BaseHTTPRequestHandler):
+    server_version = "SmartHotelRAG/1.0"
+    protocol_version = "HTTP/1.1"  # keep-alive: клиент держит одно соединение
+    # заголовки и тело уходят отдельными записями — без этого Nagle добавляет ~40 мс
+    disable_nagle_algorithm = True
+    rag: SmartHotelRAG = None
+
+    # ---------------------------------------------------------
+    # Маршруты
+    # ---------------------------------------------------------
+    def do_GET(self):
+        if self.path != "/health":
+            return self._send(404, {"error": "NOT_FOUND"})
+        self._safely(self._health)
+
+    def do_POST(self):
+        body = self._read_json()
+        if body is None:
+            return
+        routes = {"/query": self._query, "/answer": self._answer, "/reload": self._reload}
+        route = routes.get(self.path)
+        if route is None:
+            return self._send(404, {"error": "NOT_FOUND"})
+        self._safely(route, body)
+
+    def _safely(self, route, *args):
+        # любая ошибка поиска (например, нет numpy для dense) — ответ 500, а не оборванное соединение
+        try:
+            route(*args)
+        except Exception as exc:
+            logging.exception(f"rag_service: {self.path} failed")
+            self._send(500, {"error": "INTERNAL", "message": f"{type(exc).__name__}: {exc}"})
+
+    def _health(self):
+        stats = self.rag.stats()
+        self._send(200, {"status": "ok", "hotels": len(self.rag.registry), **stats})
+
+    def _query(self, body: dict):
+        queries = body.get("queries")
+        if not isinstance(queries, list) or len(queries) > MAX_BATCH:
+            return self._send(400, {"error": "BAD_REQUEST", "message": f"queries: список до {MAX_BATCH} элементов"})
+
+        results = []
+        for item in queries:
+            if not isinstance(item, dict) or not isinstance(item.get("question"), str):
+                return self._send(400, {"error": "BAD_REQUEST", "message": "нужен question"})
+            budget = item.get("budget")
+            try:
+                results.append(self.rag.query(
+                    item["question"],
+                    hotel=item.get("hotel"),
+                    top_k=int(item.get("top_k", 3)),
+                    ranking=item.get("ranking"),
+                    budget=int(budget) if budget is not None else None,
+                ))
+            except (TypeError, ValueError) as exc:
+                return self._send(400, {"error": "BAD_REQUEST", "message": str(exc)})
+        self._send(200, {"results": results})
+
+    def _answer(self, body: dict):
+        if not isinstance(body.get("question"), str):
+            return self._send(400, {"error": "BAD_REQUEST", "message": "нужен question"})
+        self._send(200, {"answer": self.rag.answer(body["question"], hotel=body.get("hotel"))})
+
+    def _reload(self, body: dict):
+        hotel = body.get("hotel")
+        if hotel and hotel not in self.rag.registry:
+            return self._send(404, {"error": "UNKNOWN_HOTEL"})
+        # через refresh(): под той же блокировкой, что и KnowledgeWatcher
+        self._send(200, {"changed": self.rag.refresh(hotel=hotel)})
+
+    # ---------------------------------------------------------
+    # HTTP
+    # ---------------------------------------------------------
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._send(413, {"error": "TOO_LARGE"})
+            return None
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"error": "BAD_JSON"})
+            return None
+        if not isinstance(body, dict):
+            self._send(400, {"error": "BAD_JSON"})
+            return None
+        return body
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # у Unix-сокета нет адреса клиента, поэтому стандартный лог не подходит
+        logging.debug("rag_service: " + format, *args)
+
+
+class UnixRagRequestHandler(RagRequestHandler):
+    # TCP_NODELAY к Unix-сокету не применим: setsockopt даёт EOPNOTSUPP и обработчик падает
+    disable_nagle_algorithm = False
+
+
+def make_server(rag: SmartHotelRAG, host: str = HOST, port: int = PORT, socket_path: str = SOCKET_PATH):
+    base = UnixRagRequestHandler if socket_path else RagRequestHandler
+    handler = type("BoundRagRequestHandler", (base,), {"rag": rag})
+    if socket_path:
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    rag = SmartHotelRAG()
+    if RAG_RELOAD_INTERVAL > 0:
+        KnowledgeWatcher(rag, interval=RAG_RELOAD_INTERVAL).start()
+
+    server = make_server(rag)
+    logging.info(f"RAG service listening on {SOCKET_PATH or f'{HOST}:{PORT}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# bot/rate_limit.py
+"""
+Ограничение исходящих запросов к GigaChat: сколько запросов идёт одновременно
+(всего и у одной площадки), с какой частотой (token bucket) и сколько ждут в очереди.
+
+Запрос, который не успеет получить место до своего дедлайна, отклоняется сразу
+(GigaChatBusy), а не висит в очереди: гость быстрее получит «попробуйте позже»,
+чем ответ, который уже никому не нужен. 429 от GigaChat с Retry-After
+приостанавливает выдачу мест на указанное время только той площадке, чей ключ
+его получил: у каждой площадки свои учётные данные и своя квота в GigaChat.
+
+LlmLimiter рассчитан на один event loop — цикл-владелец из gigachat_ai.py.
+"""
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+
+# 0 — без ограничения
+GIGACHAT_MAX_CONCURRENCY = int(os.getenv("GIGACHAT_MAX_CONCURRENCY", "8"))
+GIGACHAT_TENANT_CONCURRENCY = int(os.getenv("GIGACHAT_TENANT_CONCURRENCY", "2"))
+# Запросов в секунду и запас на всплеск
+GIGACHAT_RATE = float(os.getenv("GIGACHAT_RATE", "5"))
+GIGACHAT_RATE_BURST = int(os.getenv("GIGACHAT_RATE_BURST", "10"))
+GIGACHAT_TENANT_RATE = float(os.getenv("GIGACHAT_TENANT_RATE", "1"))
+GIGACHAT_TENANT_BURST = int(os.getenv("GIGACHAT_TENANT_BURST", "3"))
+# Сколько запросов может ждать места и сколько секунд
+GIGACHAT_QUEUE_SIZE = int(os.getenv("GIGACHAT_QUEUE_SIZE", "50"))
+GIGACHAT_QUEUE_TIMEOUT = float(os.getenv("GIGACHAT_QUEUE_TIMEOUT", "20"))
+
+
+class GigaChatBusy(RuntimeError):
+    """Запрос отклонён ограничителем; retry_after — через сколько секунд есть смысл повторить."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GigaChatRateLimited(GigaChatBusy):
+    """GigaChat ответил 429."""
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Retry-After: число секунд или HTTP-дата."""
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """
+    Token bucket с резервированием: reserve() сразу забирает токен (баланс может
+    уйти в минус) и говорит, сколько ждать, — по этому и решаем, успеет ли запрос.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(-self.tokens / self.rate, 0.0)
+
+    def cancel(self):
+        self.tokens += 1
+
+
+class LlmLimiter:
+    def __init__(
+        self,
+        max_concurrency: int = GIGACHAT_MAX_CONCURRENCY,
+        tenant_concurrency: int = GIGACHAT_TENANT_CONCURRENCY,
+        rate: float = GIGACHAT_RATE,
+        burst: int = GIGACHAT_RATE_BURST,
+        tenant_rate: float = GIGACHAT_TENANT_RATE,
+        tenant_burst: int = GIGACHAT_TENANT_BURST,
+        queue_size: int = GIGACHAT_QUEUE_SIZE,
+        max_wait: float = GIGACHAT_QUEUE_TIMEOUT,
+    ):
+        self.tenant_concurrency = tenant_concurrency
+        self.tenant_rate = tenant_rate
+        self.tenant_burst = tenant_burst
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+
+        self._global = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self._bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self._tenants: Dict[str, tuple] = {}
+        self._paused_until: Dict[str, float] = {}  # {площадка: до какого time.monotonic()}
+        self.waiting = 0
+        self.rejected = 0
+
+    def _tenant(self, tenant: str) -> tuple:
+        limits = self._tenants.get(tenant)
+        if limits is None:
+            limits = self._tenants[tenant] = (
+                asyncio.Semaphore(self.tenant_concurrency) if self.tenant_concurrency > 0 else None,
+                TokenBucket(self.tenant_rate, self.tenant_burst) if self.tenant_rate > 0 else None,
+            )
+        return limits
+
+    def pause(self, tenant: str, seconds: float):
+        """Retry-After от GigaChat: площадка tenant не получает новых мест seconds секунд."""
+        self._paused_until[tenant] = max(self._paused_until.get(tenant, 0.0), time.monotonic() + seconds)
+
+    def _pause_left(self, tenant: str) -> float:
+        left = self._paused_until.get(tenant, 0.0) - time.monotonic()
+        if left <= 0:
+            self._paused_until.pop(tenant, None)
+        return max(left, 0.0)
+
+    def deadline(self) -> float:
+        return time.monotonic() + self.max_wait
+
+    def _reject(self, reason: str, retry_after: float):
+        self.rejected += 1
+        raise GigaChatBusy(f"GIGACHAT BUSY: {reason}", retry_after=round(max(retry_after, 1.0), 1))
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, deadline: float = None):
+        """Место для одного запроса к GigaChat; GigaChatBusy — если не успеть до deadline."""
+        deadline = deadline or self.deadline()
+        if self.queue_size > 0 and self.waiting >= self.queue_size:
+            self._reject("queue is full", 1.0)
+
+        tenant_semaphore, tenant_bucket = self._tenant(tenant)
+        reserved, acquired = [], []
+        self.waiting += 1
+        try:
+            # сначала частота: ждать токен, держа место в семафоре, — значит простаивать
+            wait = 0.0
+            for bucket in (tenant_bucket, self._bucket):
+                if bucket is not None:
+                    reserved.append(bucket)
+                    wait = max(wait, bucket.reserve())
+            wait = max(wait, self._pause_left(tenant))
+            if wait > deadline - time.monotonic():
+                self._reject("rate limit", wait)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            # потом одновременность: сначала своя площадка, чтобы одна не заняла все общие места
+            for semaphore in (tenant_semaphore, self._global):
+                if semaphore is None:
+                    continue
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    await asyncio.wait_for(semaphore.acquire(), remaining)
+                except asyncio.TimeoutError:
+                    self._reject("too many concurrent requests", 1.0)
+                acquired.append(semaphore)
+        except BaseException:
+            for bucket in reserved:
+                bucket.cancel()
+            for semaphore in acquired:
+                semaphore.release()
+            raise
+        finally:
+            self.waiting -= 1
+
+        try:
+            yield
+        finally:
+            for semaphore in reversed(acquired):
+                semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "tenants": len(self._tenants),
+            "paused": sum(1 for tenant in list(self._paused_until) if self._pause_left(tenant)),
+        }
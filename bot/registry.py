@@ -0,0 +1,165 @@
+import re
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Callable, Dict, Optional
+
+
+_SLUG_SEPARATORS_RE = re.compile(r"[\s_\-]+")
+
+
+def slugify(hotel) -> str:
+    """
+    Нормализованный ключ арендатора: имя отеля или id BusinessUnit.
+    Разделители выбрасываются, чтобы имя площадки в портале совпадало с именем
+    файла знаний: «Eco House», «eco_house» и «EcoHouse.txt» → «ecohouse».
+    """
+    slug = str(hotel).strip().lower()
+    for ext in (".txt", ".json"):
+        if slug.endswith(ext):
+            slug = slug[:-len(ext)]
+    return _SLUG_SEPARATORS_RE.sub("", slug)
+
+
+class TenantRegistry:
+    """
+    Реестр индексов отелей (арендаторов).
+
+    Каталог {slug: источник} лёгкий и знает обо всех отелях, а индексы
+    загружаются лениво — при первом запросе к отелю — и хранятся в LRU.
+    Когда суммарный размер загруженных индексов превышает memory_budget
+    байт, вытесняются давно не использованные. Индекс, который вырос после
+    загрузки (лениво построенный бэкенд), сообщает об этом через on_resize.
+    Поиск по slug — O(1).
+    """
+
+    def __init__(self, loader: Callable[[str], object], memory_budget: int):
+        self._loader = loader
+        self.memory_budget = memory_budget
+        self._sources: Dict[str, str] = {}
+        self._loaded: "OrderedDict[str, object]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------------------------------------------------------
+    # Каталог
+    # ---------------------------------------------------------
+    def set_sources(self, sources: Dict[str, str]):
+        """Новый каталог {slug: источник}; индексы пропавших отелей выгружаются."""
+        with self._lock:
+            self._sources = dict(sources)
+            for slug in [s for s in self._loaded if s not in self._sources]:
+                self._drop(slug)
+
+    def __contains__(self, hotel) -> bool:
+        return slugify(hotel) in self._sources
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def is_loaded(self, hotel) -> bool:
+        return slugify(hotel) in self._loaded
+
+    def source(self, hotel) -> Optional[str]:
+        """Источник (файл знаний) отеля или None."""
+        return self._sources.get(slugify(hotel))
+
+    def version(self, hotel) -> int:
+        """Версия индекса отеля: растёт при каждой переиндексации (для кэшей)."""
+        return self._versions.get(slugify(hotel), 0)
+
+    # ---------------------------------------------------------
+    # Доступ к индексам
+    # ---------------------------------------------------------
+    def get(self, hotel) -> Optional[object]:
+        """Индекс отеля (загружается при первом обращении) или None."""
+        if hotel is None or hotel == "":
+            return None
+        slug = slugify(hotel)
+
+        with self._lock:
+            index = self._loaded.get(slug)
+            if index is not None:
+                self._loaded.move_to_end(slug)
+                self.hits += 1
+                return index
+            source = self._sources.get(slug)
+            if source is None:
+                return None
+            version = self._versions.get(slug, 0)
+            self.misses += 1
+
+        # загрузка идёт без блокировки — запросы к другим отелям не ждут
+        return self._install(slug, source, self._loader(source), version)
+
+    def reload(self, hotel):
+        """
+        Пересобирает индекс, если он загружен (незагруженный подхватится лениво),
+        и увеличивает версию. Версия растёт уже после подмены индекса — иначе
+        кэш мог бы сохранить старый ответ под новой версией.
+        """
+        slug = slugify(hotel)
+        try:
+            with self._lock:
+                source = self._sources.get(slug)
+                loaded = slug in self._loaded
+                version = self._versions.get(slug, 0)
+            if loaded and source is not None:
+                self._install(slug, source, self._loader(source), version)
+        finally:
+            with self._lock:
+                self._versions[slug] = self._versions.get(slug, 0) + 1
+
+    def _install(self, slug: str, source: str, index, version: int):
+        with self._lock:
+            if self._sources.get(slug) != source or self._versions.get(slug, 0) != version:
+                # источник сменился, пока шла загрузка — отдаём результат, но не кэшируем
+                return index
+            self._drop(slug)
+            self._loaded[slug] = index
+            self._sizes[slug] = index.nbytes
+            self._evict(keep=slug)
+        index.on_resize = partial(self.resize, slug)
+        return index
+
+    def resize(self, slug: str, index):
+        """Пересчитывает размер загруженного индекса и при перерасходе вытесняет соседей."""
+        with self._lock:
+            if self._loaded.get(slug) is not index:
+                return  # индекс уже вытеснен или подменён — в бюджете его нет
+            self._sizes[slug] = index.nbytes
+            self._evict(keep=slug)
+
+    def _drop(self, slug: str):
+        self._loaded.pop(slug, None)
+        self._sizes.pop(slug, None)
+
+    def _evict(self, keep: str):
+        while self.memory_used > self.memory_budget and len(self._loaded) > 1:
+            slug = next(iter(self._loaded))
+            if slug == keep:
+                self._loaded.move_to_end(slug)
+                continue
+            self._drop(slug)
+            self.evictions += 1
+
+    @property
+    def memory_used(self) -> int:
+        return sum(self._sizes.values())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "tenants": len(self._sources),
+                "loaded": len(self._loaded),
+                "memory_used": self.memory_used,
+                "memory_budget": self.memory_budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,124 @@
+import os
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+# Сколько правок (вставка, удаление, замена, перестановка соседних букв) прощаем;
+# 0 — исправление опечаток выключено
+TYPO_MAX_DISTANCE = int(os.getenv("RAG_TYPO_DISTANCE", "1"))
+# Порог частоты, как в SymSpell: слово, которое само есть в словаре, заменяется
+# соседом, только если тот встречается во фрагментах во столько раз чаще.
+# У незнакомого слова частота 0 — ему подходит любой сосед
+TYPO_MIN_RATIO = float(os.getenv("RAG_TYPO_MIN_RATIO", "3"))
+# Не больше одной правки на столько букв основы: «баян» (4) не превращается
+# в «банн», а «парков» (6) исправляется в «парковк»
+TYPO_CHARS_PER_EDIT = 5
+# Удаления строятся только по началу слова — это ограничивает память словаря
+PREFIX_LENGTH = 7
+# Короткие основы не исправляем: у них слишком много «соседей»
+MIN_WORD_LEN = 4
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """Само слово и все его варианты без 1..distance букв."""
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a: str, b: str, limit: int) -> Optional[int]:
+    """Расстояние Дамерау—Левенштейна (OSA) или None, если оно больше limit."""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        # перестановка смотрит на две строки назад — выходим, только если обе за пределом
+        if min(row) > limit and min(prev) > limit:
+            return None
+        prev2, prev = prev, row
+    return prev[-1] if prev[-1] <= limit else None
+
+
+class SpellIndex:
+    """
+    Исправление опечаток по словарю одного отеля (симметричные удаления, как в SymSpell).
+
+    Для каждого слова индекса заранее строятся варианты без одной-двух букв
+    из первых PREFIX_LENGTH символов; у слова с опечаткой варианты строятся
+    так же, и общие варианты дают кандидатов, которые проверяются настоящим
+    расстоянием правки. Поиск — несколько обращений к словарю, без перебора.
+    При равном расстоянии выигрывает слово, которое чаще встречается в фрагментах.
+    Число правок ограничено длиной слова (TYPO_CHARS_PER_EDIT), а знакомое слово
+    исправляется, только если сосед в min_ratio раз частее его самого.
+    """
+
+    def __init__(
+        self,
+        vocabulary: Iterable[Tuple[str, int]],
+        max_distance: int = TYPO_MAX_DISTANCE,
+        prefix_length: int = PREFIX_LENGTH,
+        min_ratio: float = TYPO_MIN_RATIO,
+    ):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.min_ratio = min_ratio
+        self.words: List[str] = []
+        self.counts = array("I")
+        # {вариант: номер слова или список номеров} — одиночный int заметно легче списка
+        self._variants: Dict[str, object] = {}
+
+        for word, count in vocabulary:
+            if len(word) < MIN_WORD_LEN:
+                continue
+            word_id = len(self.words)
+            self.words.append(word)
+            self.counts.append(count)
+            for variant in _deletes(word[:prefix_length], max_distance):
+                ids = self._variants.get(variant)
+                if ids is None:
+                    self._variants[variant] = word_id
+                elif isinstance(ids, int):
+                    self._variants[variant] = [ids, word_id]
+                else:
+                    ids.append(word_id)
+
+    def correct(self, token: str) -> Optional[str]:
+        """Ближайшее слово словаря или None, если в допустимых правках ничего не нашлось."""
+        max_distance = min(self.max_distance, len(token) // TYPO_CHARS_PER_EDIT)
+        if max_distance <= 0 or len(token) < MIN_WORD_LEN:
+            return None
+
+        own = 0  # сколько раз встречается само слово вопроса
+        candidates = []
+        seen = set()
+        for variant in _deletes(token[:self.prefix_length], max_distance):
+            ids = self._variants.get(variant)
+            if ids is None:
+                continue
+            for word_id in (ids,) if isinstance(ids, int) else ids:
+                if word_id in seen:
+                    continue
+                seen.add(word_id)
+                word = self.words[word_id]
+                distance = edit_distance(token, word, max_distance)
+                if distance == 0:
+                    own = self.counts[word_id]
+                elif distance is not None:
+                    candidates.append((distance, -self.counts[word_id], word))
+
+        candidates = [key for key in candidates if -key[1] >= self.min_ratio * own]
+        return min(candidates)[2] if candidates else None
+
+    @property
+    def nbytes(self) -> int:
+        return 120 * len(self._variants) + 64 * len(self.words) + 4 * len(self.counts)
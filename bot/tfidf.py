@@ -0,0 +1,106 @@
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from tokenizer import tokenize
+
+
+class TfidfMatrix:
+    """
+    Векторный бэкенд поиска: фрагменты отеля хранятся как разреженная
+    TF-IDF матрица (строки — фрагменты, столбцы — слова словаря).
+    Пачка вопросов оценивается одним произведением разреженных матриц.
+    """
+
+    def __init__(self, terms: Iterable[Tuple[str, Sequence[Tuple[int, int]]]], num_chunks: int):
+        self.num_chunks = num_chunks
+        self.vocab: Dict[str, int] = {}
+
+        rows, cols, tfs, df = [], [], [], []
+        for col, (token, posting) in enumerate(terms):
+            self.vocab[token] = col
+            count = 0
+            for chunk_id, tf in posting:
+                rows.append(chunk_id)
+                cols.append(col)
+                tfs.append(tf)
+                count += 1
+            df.append(count)
+
+        df = np.asarray(df, dtype=np.float32)
+        self.idf = (np.log((1 + num_chunks) / (1 + df)) + 1).astype(np.float32)
+
+        cols = np.asarray(cols, dtype=np.int32)
+        weights = (1 + np.log(np.asarray(tfs, dtype=np.float32))) * self.idf[cols]
+        matrix = sparse.csr_matrix(
+            (weights, (np.asarray(rows, dtype=np.int32), cols)),
+            shape=(num_chunks, len(self.vocab)),
+            dtype=np.float32,
+        )
+
+        # L2-нормировка строк: скалярное произведение становится косинусом
+        norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+        norms[norms == 0] = 1.0
+        matrix = sparse.diags(1 / norms).dot(matrix)
+
+        # храним сразу транспонированной: вопросы (Q×V) · (V×N)
+        self.matrix_t = matrix.T.tocsr()
+
+    @property
+    def nbytes(self) -> int:
+        matrix = self.matrix_t
+        return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes + self.idf.nbytes + 120 * len(self.vocab)
+
+    def vectorize(self, questions: List[str]) -> sparse.csr_matrix:
+        rows, cols, tfs = [], [], []
+        for row, question in enumerate(questions):
+            counts: Dict[int, int] = {}
+            for token in tokenize(question):
+                col = self.vocab.get(token)
+                if col is not None:
+                    counts[col] = counts.get(col, 0) + 1
+            for col, tf in counts.items():
+                rows.append(row)
+                cols.append(col)
+                tfs.append(tf)
+
+        cols = np.asarray(cols, dtype=np.int32)
+        weights = (1 + np.log(np.asarray(tfs, dtype=np.float32))) * self.idf[cols]
+        return sparse.csr_matrix(
+            (weights, (np.asarray(rows, dtype=np.int32), cols)),
+            shape=(len(questions), len(self.vocab)),
+            dtype=np.float32,
+        )
+
+    def search_many(self, questions: List[str], top_k: int = 3, block_size: int = 256) -> List[List[int]]:
+        """
+        Возвращает для каждого вопроса номера лучших фрагментов (по убыванию).
+        Результат произведения разворачивается в плотный вид блоками
+        по block_size вопросов, чтобы память не росла с размером пачки.
+        """
+        if not questions:
+            return []
+        if self.num_chunks == 0 or top_k <= 0:
+            return [[] for _ in questions]
+
+        scores = self.vectorize(questions).dot(self.matrix_t).tocsr()
+        k = min(top_k, self.num_chunks)
+        results: List[List[int]] = []
+
+        for start in range(0, len(questions), block_size):
+            block = scores[start:start + block_size].toarray()
+            # argpartition — O(N) выбор k лучших, сортируем только их
+            top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            for row, candidates in enumerate(top):
+                row_scores = block[row, candidates]
+                kth = row_scores.min()
+                if kth > 0:
+                    # argpartition берёт на границу любой из равных фрагментов — добираем всех равных
+                    candidates = np.flatnonzero(block[row] >= kth)
+                    row_scores = block[row, candidates]
+                # при равном счёте выше более ранний фрагмент
+                order = np.lexsort((candidates, -row_scores))[:k]
+                results.append([int(candidates[i]) for i in order if row_scores[i] > 0])
+
+        return results
@@ -0,0 +1,77 @@
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+
+# Слова без пунктуации: буквы и цифры, подчёркивание не считаем частью слова
+_WORD_RE = re.compile(r"[^\W_]+")
+_CYRILLIC_RE = re.compile(r"[а-я]")
+
+# Основа короче этого не обрезается (иначе «ели» и «ела» склеятся в «е»)
+MIN_STEM_LEN = 3
+
+STOPWORDS = frozenset("""
+а без более бы был была были было быть в вам вас ведь во вот все всё всего всех вы
+где да даже для до его ее её ей если есть еще ещё же за здесь и из или им их
+к как какая какие какой ко когда кто ли либо мне мной может можно мы на над
+нам нас не него нее неё нет ни них но ну о об обо он она они оно от по под
+пожалуйста подскажите после при про раз с сам свой со так также там тебе тебя
+то тоже только тот у уже хотел хотела хочу чем что чтобы чтоб эта эти это этот
+я
+""".split())
+
+# Окончания, отсортированные от длинных к коротким — снимаем самое длинное подходящее
+_REFLEXIVE = ("ся", "сь")
+_SUFFIXES = tuple(sorted({
+    # прилагательные и причастия
+    "ими", "ыми", "его", "ого", "ему", "ому", "ее", "ие", "ые", "ое", "ей", "ий",
+    "ый", "ой", "ем", "им", "ым", "ом", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+    # глаголы
+    "ешь", "ете", "ите", "ет", "ут", "ют", "ит", "ат", "ят", "ла", "ло", "ли", "ть", "ти",
+    # существительные
+    "ами", "ями", "ах", "ях", "ов", "ев", "ам", "ям", "ия", "ью", "ья", "ье",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+}, key=len, reverse=True))
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """
+    Лёгкий стеммер для русского: срезает возвратную частицу и одно окончание.
+    «парковка», «парковки», «парковку» → «парковк». Латиница и числа не трогаются.
+    """
+    word = word.replace("ё", "е")
+    if not _CYRILLIC_RE.search(word):
+        return word
+
+    for suffix in _REFLEXIVE:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LEN:
+            word = word[:-len(suffix)]
+            break
+
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LEN:
+            return word[:-len(suffix)]
+    return word
+
+
+@lru_cache(maxsize=65536)
+def normalize(word: str) -> Optional[str]:
+    """Слово → основа; стоп-слова дают None. Результат кэшируется."""
+    word = word.lower()
+    if word in STOPWORDS:
+        return None
+    return stem(word)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Единый конвейер для индекса и для вопросов:
+    нижний регистр → слова без пунктуации → без стоп-слов → основы.
+    """
+    tokens = []
+    for word in _WORD_RE.findall(text.lower()):
+        token = normalize(word)
+        if token:
+            tokens.append(token)
+    return tokens
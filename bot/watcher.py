@@ -0,0 +1,30 @@
+import logging
+import threading
+
+
+class KnowledgeWatcher(threading.Thread):
+    """
+    Фоновый опрос папки knowledge/: раз в interval секунд вызывает
+    SmartHotelRAG.refresh(), который переиндексирует только изменённые,
+    новые и удалённые файлы и атомарно подменяет индексы отелей.
+    Опрос вместо inotify — работает одинаково в Docker-томах и на любых ФС.
+    """
+
+    def __init__(self, rag, interval: float = 30.0):
+        super().__init__(name="knowledge-watcher", daemon=True)
+        self.rag = rag
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                changed = self.rag.refresh()
+            except Exception as e:
+                logging.error(f"Knowledge reload error: {e}")
+                continue
+            if changed:
+                logging.info(f"Knowledge reloaded: {', '.join(changed)}")
+
+    def stop(self):
+        self._stopped.set()